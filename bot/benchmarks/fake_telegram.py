@@ -0,0 +1,229 @@
+"""Локальная замена Bot API для прогонов бота без сети.
+
+Отдаёт записанные обновления через getUpdates или, после setWebhook, сама
+доставляет их POST-запросами на вебхук, как Telegram: не больше max_connections
+запросов одновременно, неуспешная доставка повторяется. sendMessage запоминается
+вместе со временем отправки. С FloodLimits отправка сверх лимитов получает 429
+с retry_after, как у Bot API.
+"""
+import itertools
+import math
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import requests
+
+from webhook import ThreadedHTTPServer
+
+TOKEN = "123456:fake-token"
+
+
+class FloodLimits:
+    """Лимиты отправки: (сообщений, за секунд) на бота, личный чат и группу (отрицательный chat_id).
+
+    Telegram допускает короткие всплески сверх средних «1 в секунду в чат»
+    и «20 в минуту в группу», поэтому окна по умолчанию чуть шире.
+    """
+
+    def __init__(
+        self,
+        total: Tuple[int, float] = (30, 1.0),
+        private: Tuple[int, float] = (2, 2.0),
+        group: Tuple[int, float] = (20, 60.0),
+    ) -> None:
+        self.total = total
+        self.private = private
+        self.group = group
+        self._sent: Dict[Any, Deque[float]] = {}
+
+    def retry_after(self, chat_id: int, now: float) -> int:
+        """0, если сообщение можно принять (и оно учтено), иначе через сколько секунд повторить."""
+        limits = [("total", self.total), (chat_id, self.group if chat_id < 0 else self.private)]
+        wait = 0.0
+        for key, (count, window) in limits:
+            sent = self._sent.setdefault(key, deque())
+            while sent and sent[0] <= now - window:
+                sent.popleft()
+            if len(sent) >= count:
+                wait = max(wait, sent[0] + window - now)
+        if wait:
+            return max(1, math.ceil(wait))
+        for key, _ in limits:
+            self._sent[key].append(now)
+        return 0
+
+
+class FakeTelegram:
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, retry_delay: float = 0.2, limits: Optional[FloodLimits] = None
+    ) -> None:
+        self.retry_delay = retry_delay
+        self.limits = limits
+        self.flood_rejections = 0
+        self._server = ThreadedHTTPServer((host, port), self._handler())
+        self._condition = threading.Condition()
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._offered: Dict[int, float] = {}
+        self._message_ids = itertools.count(1)
+        self.sent: List[Tuple[float, Dict[str, Any]]] = []
+        self.calls: Dict[str, int] = {}
+        self.webhook: Optional[Dict[str, Any]] = None
+        self.delivery_failures = 0
+        self._delivery_threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def __enter__(self) -> "FakeTelegram":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stopping.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._delivery_threads:
+            thread.join(5)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_updates(self, updates: List[Dict[str, Any]]) -> None:
+        now = time.perf_counter()
+        with self._condition:
+            for update in updates:
+                self._offered[update["update_id"]] = now
+                self._pending.append(update)
+            self._condition.notify_all()
+
+    def offered_at(self, update_id: int) -> float:
+        return self._offered[update_id]
+
+    def wait_sent(self, count: int, timeout: float, idle: float = 2.0) -> bool:
+        """Ждёт count отправленных сообщений; сдаётся после timeout или idle секунд без новых."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while len(self.sent) < count:
+                last = len(self.sent)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(min(idle, remaining))
+                if len(self.sent) == last and time.monotonic() < deadline:
+                    return False
+            return True
+
+    # --- Bot API -----------------------------------------------------------
+
+    def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + float(params.get("timeout") or 0)
+        with self._condition:
+            while self._pending and self._pending[0]["update_id"] < offset:
+                self._pending.popleft()
+            while not self._pending and not self._stopping.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return list(itertools.islice(self._pending, limit))
+
+    def _send_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._condition:
+            self.sent.append((time.perf_counter(), params))
+            self._condition.notify_all()
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": params["chat_id"], "type": "private"},
+            "text": params.get("text", ""),
+        }
+
+    def _set_webhook(self, params: Dict[str, Any]) -> bool:
+        self.webhook = params
+        if params.get("url"):
+            for _ in range(int(params.get("max_connections") or 40)):
+                thread = threading.Thread(target=self._deliver, daemon=True)
+                thread.start()
+                self._delivery_threads.append(thread)
+        return True
+
+    def _deliver(self) -> None:
+        session = requests.Session()
+        headers = {"Content-Type": "application/json"}
+        if self.webhook and self.webhook.get("secret_token"):
+            headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook["secret_token"]
+        while not self._stopping.is_set():
+            with self._condition:
+                while not self._pending and not self._stopping.is_set():
+                    self._condition.wait(0.5)
+                if self._stopping.is_set():
+                    return
+                update = self._pending.popleft()
+            try:
+                response = session.post(self.webhook["url"], data=json.dumps(update), headers=headers, timeout=10)
+                delivered = response.ok
+            except requests.RequestException:
+                delivered = False
+            if not delivered:
+                with self._condition:
+                    self.delivery_failures += 1
+                    self._pending.append(update)
+                time.sleep(self.retry_delay)
+
+    def dispatch(self, method: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._condition:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if method == "getMe":
+            result: Any = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif method == "getUpdates":
+            result = self._get_updates(params)
+        elif method == "sendMessage":
+            if self.limits is not None:
+                with self._condition:
+                    retry_after = self.limits.retry_after(int(params["chat_id"]), time.monotonic())
+                    self.flood_rejections += bool(retry_after)
+                if retry_after:
+                    return 429, {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after},
+                    }
+            result = self._send_message(params)
+        elif method == "setWebhook":
+            result = self._set_webhook(params)
+        else:
+            result = True
+        return 200, {"ok": True, "result": result}
+
+    def _handler(self) -> type:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                params = json.loads(body) if body else {}
+                status, payload = fake.dispatch(self.path.rsplit("/", 1)[-1], params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST
+
+        return Handler
@@ -0,0 +1,170 @@
+"""Всплеск сообщений в группах против лимитов Telegram: ответы сразу и через outbox.
+
+FakeTelegram здесь отвечает 429 на отправку сверх лимитов (FloodLimits). Во
+время всплеска в нескольких группах личные чаты шлют /convert и /history.
+Для каждого режима считаются 429, доставленные ответы распознавания (с учётом
+склеенных) и задержка ответов на команды. Прогон через outbox завершается с
+кодом 1, если получил хоть один 429 или доставил не все ответы; прямая
+отправка нужна только для сравнения и на код не влияет.
+
+    cd bot && python -m benchmarks.flood --groups 5 --messages 60 --private 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from .fake_telegram import TOKEN, FakeTelegram, FloodLimits
+from .replay import _TEXTS, FakeWorker, _percentile
+
+_DETECTION_MARK = "Конвертация найденных сумм:"
+
+
+def _update(update_id: int, chat: Dict[str, Any], text: str) -> Dict[str, Any]:
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": chat,
+        "from": {"id": 1, "is_bot": False, "first_name": "User"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def burst_updates(groups: int, messages: int, private: int, seed: int = 3) -> List[Dict[str, Any]]:
+    """Сообщения групп вперемешку, а команды личных чатов - в середине всплеска."""
+    rng = random.Random(seed)
+    chats = [{"id": -1000 - index, "type": "supergroup", "title": f"group {index}"} for index in range(groups)]
+    texts = [(rng.choice(chats), rng.choice(_TEXTS).format(n=rng.randint(1, 50000))) for _ in range(groups * messages)]
+    commands = []
+    for index in range(private):
+        chat = {"id": 5000 + index, "type": "private", "first_name": "User"}
+        commands += [(chat, "/convert 100 USD RUB"), (chat, "/history 3")]
+    middle = len(texts) // 2
+    ordered = texts[:middle] + commands + texts[middle:]
+    return [_update(index + 1, chat, text) for index, (chat, text) in enumerate(ordered)]
+
+
+def _wait_idle(fake: FakeTelegram, bot: Any, idle: float, timeout: float) -> None:
+    """Ждёт, пока outbox опустеет и idle секунд не будет ни одной попытки отправки."""
+    deadline = time.monotonic() + timeout
+    last = (-1, -1)
+    quiet_since = time.monotonic()
+    while time.monotonic() < deadline:
+        current = (len(fake.sent), fake.flood_rejections)
+        stats = bot.outbox.stats()
+        if current != last or stats["pending"] or bot.outbox.in_flight:
+            last, quiet_since = current, time.monotonic()
+        elif time.monotonic() - quiet_since >= idle:
+            return
+        time.sleep(0.1)
+
+
+def run(bot: Any, updates: List[Dict[str, Any]], use_outbox: bool, idle: float, timeout: float) -> Dict[str, Any]:
+    bot.settings.outbox_enabled = use_outbox
+    with FakeTelegram(limits=FloodLimits()) as fake:
+        bot.settings.telegram_api_url = fake.base_url
+        updater = bot.build_updater(run_async=True)
+        if use_outbox:
+            bot.outbox.start(updater.bot)
+        fake.add_updates(updates)
+        started = time.perf_counter()
+        updater.start_polling(poll_interval=0.0, timeout=1)
+        _wait_idle(fake, bot, idle, timeout)
+        updater.stop()
+        outbox_stats = bot.outbox.stats() if use_outbox else None
+        if use_outbox:
+            bot.outbox.stop(5)
+
+        offered: Dict[int, Deque[float]] = defaultdict(deque)
+        expected_detections = 0
+        for update in updates:
+            message = update["message"]
+            if message["chat"]["type"] == "private":
+                offered[message["chat"]["id"]].append(fake.offered_at(update["update_id"]))
+            elif any(char.isdigit() for char in message["text"]):
+                expected_detections += 1
+        command_latencies = []
+        detections = 0
+        for sent_at, params in fake.sent:
+            chat_id = int(params["chat_id"])
+            if chat_id > 0 and offered[chat_id]:
+                command_latencies.append(sent_at - offered[chat_id].popleft())
+            detections += params.get("text", "").count(_DETECTION_MARK)
+        finished = fake.sent[-1][0] if fake.sent else started
+        return {
+            "mode": "outbox" if use_outbox else "direct",
+            "elapsed_s": round(finished - started, 2),
+            "messages_sent": len(fake.sent),
+            "flood_429": fake.flood_rejections,
+            "detections_delivered": detections,
+            "detections_expected": expected_detections,
+            "commands_answered": len(command_latencies),
+            "commands_expected": sum(1 for update in updates if update["message"]["chat"]["type"] == "private"),
+            "command_p50_ms": round(_percentile(command_latencies, 0.5) * 1000, 1),
+            "command_p95_ms": round(_percentile(command_latencies, 0.95) * 1000, 1),
+            "outbox": outbox_stats,
+        }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=60, help="messages per group")
+    parser.add_argument("--private", type=int, default=20, help="private chats sending /convert and /history")
+    parser.add_argument("--mode", choices=("direct", "outbox", "both"), default="both")
+    parser.add_argument("--worker-latency", type=float, default=5.0, help="fake worker latency, ms")
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds without sends that end a run")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    updates = burst_updates(args.groups, args.messages, args.private)
+    with FakeWorker(args.worker_latency / 1000) as fake_worker:
+        os.environ["TELEGRAM_BOT_TOKEN"] = TOKEN
+        os.environ["API_BASE_URL"] = fake_worker.url
+        import bot
+
+        # Ответы сразу упираются в 429, и PTB пишет каждую ошибку обработчика с трассировкой.
+        logging.getLogger().setLevel(logging.CRITICAL)
+        bot.prefilter.refresh()
+        modes = ("direct", "outbox") if args.mode == "both" else (args.mode,)
+        results = [run(bot, updates, mode == "outbox", args.idle, args.timeout) for mode in modes]
+        bot.worker.close()
+
+    for row in results:
+        print(
+            f"{row['mode']:7} {row['messages_sent']:5} sent in {row['elapsed_s']:7} s  429s {row['flood_429']:5}  "
+            f"detections {row['detections_delivered']}/{row['detections_expected']}  "
+            f"commands {row['commands_answered']}/{row['commands_expected']} "
+            f"p50 {row['command_p50_ms']} ms p95 {row['command_p95_ms']} ms"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    failures = []
+    for row in results:
+        if row["mode"] != "outbox":
+            continue
+        if row["flood_429"]:
+            failures.append(f"outbox: {row['flood_429']} responses 429")
+        if row["detections_delivered"] < row["detections_expected"]:
+            failures.append(f"outbox: detections {row['detections_delivered']}/{row['detections_expected']}")
+        if row["commands_answered"] < row["commands_expected"]:
+            failures.append(f"outbox: commands {row['commands_answered']}/{row['commands_expected']}")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Прогон записанных обновлений через бота в режиме опроса и вебхука без сети.
+
+Telegram заменяет FakeTelegram, воркер - локальный HTTP-сервер с заданной
+задержкой /detect-currencies и небольшим словарём /aliases для предфильтра. Обновления берутся из JSONL (по объекту Update
+на строку, как в ответе getUpdates) или генерируются: текстовые сообщения в
+личных чатах, на каждое бот отвечает одним сообщением. Меряется приём
+обновлений, поэтому outbox (темп отправки по лимитам Telegram, см.
+benchmarks.flood) по умолчанию выключен.
+
+    cd bot && python -m benchmarks.replay --messages 2000 --chats 200 --worker-latency 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from webhook import ThreadedHTTPServer
+
+from .fake_telegram import TOKEN, FakeTelegram
+
+_TEXTS = (
+    "купил билеты за {n} рублей",
+    "отдал {n}$ за наушники",
+    "это стоит {n} евро?",
+    "привет, как дела",
+    "созвонимся вечером",
+    "перевёл {n} тенге",
+)
+
+_ALIASES = {
+    "version": 1,
+    "aliases": {"RUB": ["рублей", "руб"], "USD": ["$", "usd"], "EUR": ["евро"], "KZT": ["тенге"]},
+    "symbols": {"$": "USD", "€": "EUR", "₽": "RUB"},
+    "suffixes": ["к", "k", "тыс"],
+    "multipliers": [["к", 1000], ["k", 1000], ["тыс", 1000]],
+}
+
+
+class FakeWorker:
+    """Воркер с фиксированными ответами и задержкой на каждый вызов."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadedHTTPServer(("127.0.0.1", 0), self._handler())
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:%d" % self._server.server_address[1]
+
+    def __enter__(self) -> "FakeWorker":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if path.startswith("/aliases"):
+            return _ALIASES
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        if path.startswith("/detect-currencies"):
+            digits = "".join(ch for ch in payload.get("text", "") if ch.isdigit())
+            if not digits:
+                return {"items": []}
+            conversion = {"quote_currency": "USD", "converted_amount": int(digits) / 90, "rate": 1 / 90}
+            return {"items": [{"source_amount": float(digits), "source_currency": "RUB", "conversions": [conversion]}]}
+        if path.startswith("/convert"):
+            amount = payload.get("amount", 1)
+            return {
+                "amount": amount,
+                "base_currency": payload.get("base_currency"),
+                "quote_currency": payload.get("quote_currency"),
+                "rate": 90.0,
+                "converted_amount": amount * 90.0,
+            }
+        return {"conversions": [], "next_cursor": None}
+
+    def _handler(self) -> type:
+        worker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                data = json.dumps(worker.respond(self.path, json.loads(body) if body else {})).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST
+
+        return Handler
+
+
+def synthetic_updates(count: int, chats: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    updates = []
+    for index in range(count):
+        chat_id = 1000 + rng.randrange(chats)
+        text = rng.choice(_TEXTS).format(n=rng.randint(1, 50000))
+        updates.append(
+            {
+                "update_id": index + 1,
+                "message": {
+                    "message_id": index + 1,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+                    "text": text,
+                },
+            }
+        )
+    return updates
+
+
+def load_updates(path: Path) -> List[Dict[str, Any]]:
+    with path.open(encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: Sequence[float], share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def _report(mode: str, fake: FakeTelegram, updates: List[Dict[str, Any]], started: float) -> Dict[str, Any]:
+    """Задержка ответа считается по чатам: k-й ответ в чате соотносится с k-м обновлением этого чата."""
+    offered: Dict[int, Deque[float]] = defaultdict(deque)
+    for update in updates:
+        message = update.get("message") or {}
+        if "chat" in message:
+            offered[message["chat"]["id"]].append(fake.offered_at(update["update_id"]))
+    latencies = []
+    for sent_at, params in fake.sent:
+        queue = offered.get(int(params["chat_id"]))
+        if queue:
+            latencies.append(sent_at - queue.popleft())
+    finished = fake.sent[-1][0] if fake.sent else started
+    elapsed = max(finished - started, 1e-9)
+    return {
+        "mode": mode,
+        "updates": len(updates),
+        "replies": len(fake.sent),
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(len(updates) / elapsed, 1),
+        "latency_p50_ms": round(_percentile(latencies, 0.5) * 1000, 1),
+        "latency_p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "webhook_retries": fake.delivery_failures,
+    }
+
+
+def run_polling(bot: Any, updates: List[Dict[str, Any]], expected: int, timeout: float) -> Dict[str, Any]:
+    with FakeTelegram() as fake:
+        bot.settings.telegram_api_url = fake.base_url
+        updater = bot.build_updater(run_async=True)
+        if bot.settings.outbox_enabled:
+            bot.outbox.start(updater.bot)
+        fake.add_updates(updates)
+        started = time.perf_counter()
+        updater.start_polling(poll_interval=0.0, timeout=1)
+        fake.wait_sent(expected, timeout)
+        updater.stop()
+        if bot.settings.outbox_enabled:
+            bot.outbox.stop(bot.settings.drain_timeout)
+        return _report("polling", fake, updates, started)
+
+
+def run_webhook(bot: Any, updates: List[Dict[str, Any]], expected: int, timeout: float) -> Dict[str, Any]:
+    with FakeTelegram() as fake:
+        port = _free_port()
+        bot.settings.telegram_api_url = fake.base_url
+        bot.settings.webhook_listen = "127.0.0.1"
+        bot.settings.webhook_port = port
+        bot.settings.webhook_url = f"http://127.0.0.1:{port}/telegram"
+        updater = bot.build_updater(run_async=False)
+        if bot.settings.outbox_enabled:
+            bot.outbox.start(updater.bot)
+        pipeline, server = bot.start_webhook(updater)
+        fake.add_updates(updates)
+        started = time.perf_counter()
+        updater.bot.set_webhook(url=bot.settings.webhook_url, max_connections=bot.settings.webhook_max_connections)
+        fake.wait_sent(expected, timeout)
+        bot.stop_webhook(pipeline, server)
+        if bot.settings.outbox_enabled:
+            bot.outbox.stop(bot.settings.drain_timeout)
+        report = _report("webhook", fake, updates, started)
+        report["pipeline"] = pipeline.stats()
+        return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=Path, help="JSONL with recorded Update objects")
+    parser.add_argument("--messages", type=int, default=1000, help="synthetic updates when --updates is not given")
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--expect", type=int, help="replies to wait for (default: one per text message)")
+    parser.add_argument("--mode", choices=("polling", "webhook", "both"), default="both")
+    parser.add_argument("--workers", type=int, help="handler threads (BOT_HANDLER_WORKERS)")
+    parser.add_argument("--queue-size", type=int, help="webhook queue size (UPDATE_QUEUE_SIZE)")
+    parser.add_argument("--worker-latency", type=float, default=20.0, help="fake worker latency, ms")
+    parser.add_argument("--no-prefilter", action="store_true", help="send every message to the worker")
+    parser.add_argument("--outbox", action="store_true", help="pace replies through the outbox")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    updates = load_updates(args.updates) if args.updates else synthetic_updates(args.messages, args.chats)
+    expected = args.expect or sum(1 for update in updates if (update.get("message") or {}).get("text"))
+
+    with FakeWorker(args.worker_latency / 1000) as fake_worker:
+        # Бот читает настройки при импорте, поэтому окружение готовится заранее.
+        os.environ["TELEGRAM_BOT_TOKEN"] = TOKEN
+        os.environ["API_BASE_URL"] = fake_worker.url
+        if args.workers:
+            os.environ["BOT_HANDLER_WORKERS"] = str(args.workers)
+        if args.queue_size:
+            os.environ["UPDATE_QUEUE_SIZE"] = str(args.queue_size)
+        os.environ["PREFILTER_ENABLED"] = "0" if args.no_prefilter else "1"
+        os.environ["OUTBOX_ENABLED"] = "1" if args.outbox else "0"
+        import bot
+
+        if bot.settings.prefilter_enabled:
+            bot.prefilter.refresh()
+        modes = ("polling", "webhook") if args.mode == "both" else (args.mode,)
+        runners = {"polling": run_polling, "webhook": run_webhook}
+        results = []
+        for mode in modes:
+            calls, skipped = fake_worker.requests, bot.prefilter.stats.skipped
+            row = runners[mode](bot, updates, expected, args.timeout)
+            row["worker_calls"] = fake_worker.requests - calls
+            row["prefilter_skipped"] = bot.prefilter.stats.skipped - skipped
+            results.append(row)
+        bot.worker.close()
+
+    for row in results:
+        print(
+            f"{row['mode']:8} {row['replies']:6}/{row['updates']} replies in {row['elapsed_s']:8} s  "
+            f"{row['updates_per_s']:9} upd/s  p50 {row['latency_p50_ms']:8} ms  p95 {row['latency_p95_ms']:8} ms  "
+            f"retries {row['webhook_retries']}  worker calls {row['worker_calls']} "
+            f"(prefilter skipped {row['prefilter_skipped']})"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,15 @@
 import logging
 import re
+import signal
+import threading
+import time
 from datetime import datetime, timezone
+from urllib.parse import urlsplit
 from zoneinfo import ZoneInfo
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
-from telegram import KeyboardButton, ReplyKeyboardMarkup, Update
+from telegram import Chat, KeyboardButton, ReplyKeyboardMarkup, Update
 from telegram.ext import (
     CallbackContext,
     CommandHandler,
@@ -15,11 +19,32 @@ from telegram.ext import (
 )
 
 from config import get_settings
+from outbox import Outbox
+from prefilter import SharedPrefilter
+from webhook import UpdatePipeline, WebhookServer
+from worker_client import WorkerClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
+worker = WorkerClient(
+    settings.api_base_url,
+    pool_size=settings.handler_workers,
+    connect_timeout=settings.worker_connect_timeout,
+    read_timeout=settings.worker_read_timeout,
+    retries=settings.worker_retries,
+    backoff=settings.worker_retry_backoff,
+)
+# Сообщения, где не может быть сумм с валютой, не уходят в воркер; словарь берётся у воркера.
+prefilter = SharedPrefilter(lambda: worker.get("/aliases"), settings.aliases_refresh_interval)
+outbox = Outbox(
+    senders=settings.outbox_senders,
+    global_rate=settings.outbox_global_rate,
+    chat_rate=settings.outbox_chat_rate,
+    group_rate=settings.outbox_group_rate,
+    max_pending=settings.outbox_max_pending,
+)
 
 
 def _format_amount(value: float) -> str:
@@ -41,10 +66,26 @@ def _main_menu_keyboard() -> ReplyKeyboardMarkup:
 
 
 def call_worker(endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    url = f"{settings.api_base_url}{endpoint}"
-    response = requests.post(url, json=payload, timeout=10)
-    response.raise_for_status()
-    return response.json()
+    return worker.post(endpoint, payload)
+
+
+def _reply(update: Update, text: str, passive: bool = False, **kwargs: Any) -> None:
+    """Ответ в чат обновления через outbox (с OUTBOX_ENABLED=0 - сразу, как reply_text).
+
+    passive - ответ распознавания: уступает командам и склеивается с другими
+    такими же ответами в этот чат, пока ждёт отправки.
+    """
+    message = update.effective_message
+    if not settings.outbox_enabled:
+        message.reply_text(text, **kwargs)
+        return
+    group = message.chat.type != Chat.PRIVATE
+    if group:
+        # reply_text в группах отвечает цитатой на исходное сообщение.
+        kwargs.setdefault("reply_to_message_id", message.message_id)
+    lane = Outbox.PASSIVE if passive else Outbox.DIRECT
+    if not outbox.send(message.chat.id, text, group=group, lane=lane, coalesce=passive, **kwargs):
+        logger.warning("Outbox rejected a reply to chat %s", message.chat.id)
 
 
 def greet(update: Update, _: CallbackContext) -> None:
@@ -53,24 +94,27 @@ def greet(update: Update, _: CallbackContext) -> None:
         "Отправьте любое сообщение и бот найдёт суммы и сконвертирует их.\n"
         "Используйте /convert <сумма> <из> <в> для явной конвертации или /history <число> для просмотра истории."
     )
-    update.message.reply_text(text, reply_markup=_main_menu_keyboard())
+    _reply(update, text, reply_markup=_main_menu_keyboard())
 
 
 def _respond_with_menu_text(update: Update, text: str) -> None:
-    update.effective_message.reply_text(text, reply_markup=_main_menu_keyboard())
+    _reply(update, text, reply_markup=_main_menu_keyboard())
 
 
 def _send_currency_conversions(update: Update, text: str) -> None:
-    try:
-        payload = call_worker("/detect-currencies", {"text": text})
-    except requests.RequestException:
-        logger.exception("Failed to detect currencies")
-        return
+    if settings.prefilter_enabled and prefilter.should_skip(text):
+        items: List[Dict[str, Any]] = []
+    else:
+        try:
+            payload = call_worker("/detect-currencies", {"text": text})
+        except requests.RequestException:
+            logger.exception("Failed to detect currencies")
+            return
+        items = payload.get("items") or []
 
-    items: List[Dict[str, Any]] = payload.get("items") or []
     if not items:
         if update.message.chat.type == "private": 
-            update.message.reply_text("В тексте не найдено упоминаний валют")
+            _reply(update, "В тексте не найдено упоминаний валют", passive=True)
         return
 
     lines = ["Конвертация найденных сумм:"]
@@ -82,7 +126,7 @@ def _send_currency_conversions(update: Update, text: str) -> None:
                 f"(курс {conversion['rate']:.4f})"
             )
 
-    update.message.reply_text("\n".join(lines))
+    _reply(update, "\n".join(lines), passive=True)
 
 
 def handle_text(update: Update, _: CallbackContext) -> None:
@@ -128,25 +172,23 @@ def history(update: Update, context: CallbackContext) -> None:
             limit = int(args[0])
             limit = max(1, min(limit, 20))
         except ValueError:
-            update.message.reply_text(
+            _reply(
+                update,
                 "❌ Используйте: /history [число]. Пример: /history 10"
             )
             return
     
     try:
-        url = f"{settings.api_base_url}/history?limit={limit}"
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
+        data = worker.get("/history", params={"limit": limit}, timeout=(settings.worker_connect_timeout, 5))
     except requests.RequestException:
         logger.exception("Failed to fetch history")
-        update.message.reply_text("📛 История временно недоступна.")
+        _reply(update, "📛 История временно недоступна.")
         return
     
     conversions = data.get("conversions", [])
     
     if not conversions:
-        update.message.reply_text("📭 История конвертаций пуста.")
+        _reply(update, "📭 История конвертаций пуста.")
         return
     
     lines = [f"📜 *Последние {len(conversions)} конвертаций:*\n"]
@@ -163,7 +205,7 @@ def history(update: Update, context: CallbackContext) -> None:
     
     lines.append(f"\n🌐 *Полная история:* http://localhost:8501")
     
-    update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+    _reply(update, "\n".join(lines), parse_mode="Markdown")
 
 
 def _format_moscow_time(value: str) -> str:
@@ -179,28 +221,69 @@ def _format_moscow_time(value: str) -> str:
     return parsed.astimezone(ZoneInfo("Europe/Moscow")).strftime("%d.%m.%Y %H:%M")
 
 
+class RatesBoard:
+    """Текст «Актуальные курсы» для POPULAR_PAIRS одним запросом GET /rates.
+
+    Готовый текст живёт ttl секунд, затем сверяется с воркером по ETag (версии
+    снимка курсов) и перестраивается, только если курсы сменились. Запрос идёт
+    под блокировкой, так что одновременные нажатия кнопки делают один вызов.
+    """
+
+    def __init__(self, pairs: List[Tuple[str, str]], ttl: float) -> None:
+        self.pairs = pairs
+        self.ttl = ttl
+        self.params = {
+            "base": ",".join(dict.fromkeys(base for base, _ in pairs)),
+            "quotes": ",".join(dict.fromkeys(quote for _, quote in pairs)),
+        }
+        self._lock = threading.Lock()
+        self._etag: Optional[str] = None
+        self._text: Optional[str] = None
+        self._checked_at = 0.0
+
+    def _render(self, rates: Dict[str, Dict[str, float]]) -> str:
+        lines = ["Актуальные курсы:"]
+        for base, quote in self.pairs:
+            rate = rates[base][quote]
+            lines.append(f"1 {base} = {round(rate, 4):.4f} {quote} (курс {rate:.4f})")
+        return "\n".join(lines)
+
+    def text(self) -> str:
+        with self._lock:
+            if self._text is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._text
+            try:
+                etag, data = worker.get_if_changed("/rates", self.params, self._etag)
+            except requests.RequestException as exc:
+                if self._text is None:
+                    raise
+                logger.warning("Failed to refresh rates (%s), showing the previous board", exc)
+                return self._text
+            if data is not None:
+                self._text = self._render(data["rates"])
+                self._etag = etag
+            self._checked_at = time.monotonic()
+            return self._text
+
+
+rates_board = RatesBoard(POPULAR_PAIRS, settings.rates_board_ttl)
+
+
 def _send_rates(update: Update) -> None:
-    lines = ["Актуальные курсы:"]
-    for base, quote in POPULAR_PAIRS:
-        try:
-            data = call_worker(
-                "/convert",
-                {
-                    "amount": 1,
-                    "base_currency": base,
-                    "quote_currency": quote,
-                },
-            )
-        except requests.RequestException:
-            logger.exception("Failed to fetch rates")
-            update.message.reply_text("Не получается получить курсы. Попробуйте позже.", reply_markup=_main_menu_keyboard())
-            return
-        lines.append(f"1 {base} = {data['converted_amount']:.4f} {quote} (курс {data['rate']:.4f})")
-    _respond_with_menu_text(update, "\n".join(lines))
+    try:
+        text = rates_board.text()
+    except requests.RequestException:
+        logger.exception("Failed to fetch rates")
+        _reply(update, "Не получается получить курсы. Попробуйте позже.", reply_markup=_main_menu_keyboard())
+        return
+    _respond_with_menu_text(update, text)
+
+
 def convert(update: Update, context: CallbackContext) -> None:
     args = context.args
     if len(args) != 3:
-        update.message.reply_text(
+        _reply(
+            update,
             "🔄 *Используйте:* `/convert <сумма> <из> <в>`\n\n"
             "📝 *Примеры:*\n"
             "• `/convert 100 USD RUB`\n"
@@ -218,7 +301,7 @@ def convert(update: Update, context: CallbackContext) -> None:
         
         amount = _parse_amount_with_suffix(amount_text)
     except ValueError as e:
-        update.message.reply_text(f"❌ Ошибка в сумме: {str(e)}")
+        _reply(update, f"❌ Ошибка в сумме: {str(e)}")
         return
     
     try:
@@ -233,14 +316,14 @@ def convert(update: Update, context: CallbackContext) -> None:
     except requests.HTTPError as http_exc:
         if http_exc.response is not None and http_exc.response.status_code == 502:
             detail = http_exc.response.json().get("detail", "Ошибка конвертации")
-            update.message.reply_text(detail)
+            _reply(update, detail)
         else:
-            update.message.reply_text("❌ Не удалось конвертировать. Проверьте коды валют.")
+            _reply(update, "❌ Не удалось конвертировать. Проверьте коды валют.")
         logger.exception("Conversion failed")
         return
     except requests.RequestException:
         logger.exception("Call to convert endpoint failed")
-        update.message.reply_text("⚠️ Сервис недоступен. Попробуйте позже.")
+        _reply(update, "⚠️ Сервис недоступен. Попробуйте позже.")
         return
     
     def format_large_number(num):
@@ -258,7 +341,7 @@ def convert(update: Update, context: CallbackContext) -> None:
         f"📊 Курс: 1 {data['base_currency']} = {data['rate']:.6f} {data['quote_currency']}"
     )
     
-    update.message.reply_text(reply, parse_mode="Markdown")
+    _reply(update, reply, parse_mode="Markdown")
 def _parse_amount_with_suffix(amount_text: str) -> float:
     """Преобразует строку с 'к' или 'м' в число"""
     amount_text = amount_text.strip().lower()
@@ -288,19 +371,93 @@ def _parse_amount_with_suffix(amount_text: str) -> float:
     except ValueError:
         raise ValueError(f"Не удалось распознать число: {amount_text}")
 
-def main() -> None:
-    updater = Updater(token=settings.telegram_token, use_context=True)
+def build_updater(run_async: bool) -> Updater:
+    """Updater с обработчиками бота.
+
+    При опросе обработчики идут в пуле потоков диспетчера (run_async), так что
+    медленный вызов воркера в одном чате не держит остальные; в режиме вебхука
+    параллельность даёт UpdatePipeline, и обработчики выполняются в его потоках.
+    Пулу HTTP-соединений Telegram нужно по соединению на поток обработчиков и
+    отправителей outbox плюс запас для getUpdates.
+    """
+    updater = Updater(
+        token=settings.telegram_token,
+        base_url=settings.telegram_api_url,
+        use_context=True,
+        workers=settings.handler_workers,
+        request_kwargs={"con_pool_size": settings.handler_workers + settings.outbox_senders + 4},
+    )
     dispatcher = updater.dispatcher
 
-    dispatcher.add_handler(CommandHandler("start", greet))
-    dispatcher.add_handler(CommandHandler("help", greet))
-    dispatcher.add_handler(CommandHandler("convert", convert))
-    dispatcher.add_handler(CommandHandler("history", history))
-    dispatcher.add_handler(MessageHandler(Filters.text & ~Filters.command, handle_text))
+    dispatcher.add_handler(CommandHandler("start", greet, run_async=run_async))
+    dispatcher.add_handler(CommandHandler("help", greet, run_async=run_async))
+    dispatcher.add_handler(CommandHandler("convert", convert, run_async=run_async))
+    dispatcher.add_handler(CommandHandler("history", history, run_async=run_async))
+    dispatcher.add_handler(MessageHandler(Filters.text & ~Filters.command, handle_text, run_async=run_async))
+    return updater
+
+
+def start_webhook(updater: Updater) -> Tuple[UpdatePipeline, WebhookServer]:
+    pipeline = UpdatePipeline(
+        updater.dispatcher,
+        workers=settings.handler_workers,
+        queue_size=settings.update_queue_size,
+        put_timeout=settings.update_put_timeout,
+    )
+    server = WebhookServer(
+        pipeline,
+        settings.webhook_listen,
+        settings.webhook_port,
+        urlsplit(settings.webhook_url or "").path or "/",
+        settings.webhook_secret,
+    )
+    pipeline.start()
+    server.start()
+    return pipeline, server
+
+
+def stop_webhook(pipeline: UpdatePipeline, server: WebhookServer) -> None:
+    """Сначала закрывает приём (Telegram повторит доставку позже), затем дорабатывает очередь."""
+    server.stop()
+    pipeline.drain(settings.drain_timeout)
+    logger.info("Webhook pipeline stopped: %s", pipeline.stats())
+
 
-    logger.info("Starting Telegram bot")
-    updater.start_polling()
-    updater.idle()
+def run_webhook(updater: Updater) -> None:
+    pipeline, server = start_webhook(updater)
+    updater.bot.set_webhook(
+        url=settings.webhook_url,
+        max_connections=settings.webhook_max_connections,
+        secret_token=settings.webhook_secret,
+    )
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    logger.info("Receiving updates on port %d with %d workers", server.port, settings.handler_workers)
+    stop.wait()
+    stop_webhook(pipeline, server)
+
+
+def main() -> None:
+    if settings.prefilter_enabled:
+        prefilter.start()
+    updater = build_updater(run_async=not settings.webhook_url)
+    if settings.outbox_enabled:
+        outbox.start(updater.bot)
+    if settings.webhook_url:
+        logger.info("Starting Telegram bot in webhook mode")
+        run_webhook(updater)
+    else:
+        logger.info("Starting Telegram bot with %d handler workers", settings.handler_workers)
+        updater.start_polling()
+        updater.idle()
+    if settings.outbox_enabled:
+        outbox.stop(settings.drain_timeout)
+        logger.info("Outbox stopped: %s", outbox.stats())
+    prefilter.stop()
+    if settings.prefilter_enabled:
+        logger.info("Prefilter: %s", prefilter.stats.snapshot())
+    worker.close()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,35 @@
 import os
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
 class Settings:
     telegram_token: str
     api_base_url: str = "http://api:8000"
+    handler_workers: int = 16
+    worker_connect_timeout: float = 3.05
+    worker_read_timeout: float = 10.0
+    worker_retries: int = 2
+    worker_retry_backoff: float = 0.2
+    telegram_api_url: Optional[str] = None
+    webhook_url: Optional[str] = None
+    webhook_listen: str = "0.0.0.0"
+    webhook_port: int = 8443
+    webhook_secret: Optional[str] = None
+    webhook_max_connections: int = 40
+    update_queue_size: int = 1000
+    update_put_timeout: float = 0.5
+    drain_timeout: float = 30.0
+    prefilter_enabled: bool = True
+    aliases_refresh_interval: float = 300.0
+    rates_board_ttl: float = 60.0
+    outbox_enabled: bool = True
+    outbox_senders: int = 4
+    outbox_global_rate: float = 25.0
+    outbox_chat_rate: float = 1.0
+    outbox_group_rate: float = 20 / 60
+    outbox_max_pending: int = 10000
 
 
 def get_settings() -> Settings:
@@ -13,4 +37,30 @@ def get_settings() -> Settings:
     if not token:
         raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
     api_base = os.getenv("API_BASE_URL", "http://api:8000").rstrip("/")
-    return Settings(telegram_token=token, api_base_url=api_base)
+    return Settings(
+        telegram_token=token,
+        api_base_url=api_base,
+        handler_workers=int(os.getenv("BOT_HANDLER_WORKERS", "16")),
+        worker_connect_timeout=float(os.getenv("WORKER_CONNECT_TIMEOUT", "3.05")),
+        worker_read_timeout=float(os.getenv("WORKER_READ_TIMEOUT", "10")),
+        worker_retries=int(os.getenv("WORKER_RETRIES", "2")),
+        worker_retry_backoff=float(os.getenv("WORKER_RETRY_BACKOFF", "0.2")),
+        telegram_api_url=os.getenv("TELEGRAM_API_URL") or None,
+        webhook_url=os.getenv("TELEGRAM_WEBHOOK_URL") or None,
+        webhook_listen=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+        webhook_port=int(os.getenv("WEBHOOK_PORT", "8443")),
+        webhook_secret=os.getenv("WEBHOOK_SECRET") or None,
+        webhook_max_connections=int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40")),
+        update_queue_size=int(os.getenv("UPDATE_QUEUE_SIZE", "1000")),
+        update_put_timeout=float(os.getenv("UPDATE_PUT_TIMEOUT", "0.5")),
+        drain_timeout=float(os.getenv("DRAIN_TIMEOUT", "30")),
+        prefilter_enabled=os.getenv("PREFILTER_ENABLED", "1").lower() not in {"0", "false", "no"},
+        aliases_refresh_interval=float(os.getenv("ALIASES_REFRESH_INTERVAL", "300")),
+        rates_board_ttl=float(os.getenv("RATES_BOARD_TTL", "60")),
+        outbox_enabled=os.getenv("OUTBOX_ENABLED", "1").lower() not in {"0", "false", "no"},
+        outbox_senders=int(os.getenv("OUTBOX_SENDERS", "4")),
+        outbox_global_rate=float(os.getenv("OUTBOX_GLOBAL_RATE", "25")),
+        outbox_chat_rate=float(os.getenv("OUTBOX_CHAT_RATE", "1")),
+        outbox_group_rate=float(os.getenv("OUTBOX_GROUP_RATE", str(20 / 60))),
+        outbox_max_pending=int(os.getenv("OUTBOX_MAX_PENDING", "10000")),
+    )
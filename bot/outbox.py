@@ -0,0 +1,283 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from telegram import Bot
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError, TimedOut
+
+logger = logging.getLogger(__name__)
+
+# Предел длины сообщения Bot API; склеенный ответ не должен его превышать.
+MAX_TEXT_LENGTH = 4096
+
+
+class TokenBucket:
+    """rate отправок в секунду, не больше burst подряд."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько ждать до следующего токена; 0, если он уже есть."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class OutgoingMessage:
+    __slots__ = ("seq", "chat_id", "text", "last_part", "kwargs", "reply_to", "lane", "coalesce", "parts", "attempts")
+
+    def __init__(
+        self, seq: int, chat_id: int, text: str, kwargs: Dict[str, Any], reply_to: Optional[int], lane: int, coalesce: bool
+    ) -> None:
+        self.seq = seq
+        self.chat_id = chat_id
+        self.text = text
+        self.last_part = text
+        self.kwargs = kwargs
+        self.reply_to = reply_to
+        self.lane = lane
+        self.coalesce = coalesce
+        self.parts = 1
+        self.attempts = 0
+
+
+class _Chat:
+    __slots__ = ("bucket", "lanes", "paused_until", "in_flight")
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.bucket = bucket
+        self.lanes: Tuple[Deque[OutgoingMessage], Deque[OutgoingMessage]] = (deque(), deque())
+        self.paused_until = 0.0
+        self.in_flight = False
+
+    def head(self) -> Optional[OutgoingMessage]:
+        for lane in self.lanes:
+            if lane:
+                return lane[0]
+        return None
+
+
+class Outbox:
+    """Очередь исходящих сообщений с учётом лимитов Telegram.
+
+    Отправку ограничивают общий токен-бакет бота и бакет каждого чата (для групп
+    строже, чем для личных). Из готовых к отправке чатов берётся сообщение
+    прямой полосы (ответы на команды) раньше пассивной (ответы распознавания),
+    внутри полосы - по порядку постановки. В чате одновременно отправляется
+    одно сообщение, так что порядок ответов в чате сохраняется. Пассивные
+    ответы, ждущие отправки в один чат, склеиваются в одно сообщение. На 429
+    чат ставится на паузу retry_after, и сообщение уходит повторно.
+    """
+
+    DIRECT = 0
+    PASSIVE = 1
+
+    def __init__(
+        self,
+        senders: int = 4,
+        global_rate: float = 25.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20 / 60,
+        max_pending: int = 10000,
+        retries: int = 3,
+    ) -> None:
+        self.senders = senders
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_pending = max_pending
+        self.retries = retries
+        self.bot: Optional[Bot] = None
+        self._global = TokenBucket(global_rate, 1.0, time.monotonic())
+        self._chats: Dict[int, _Chat] = {}
+        self._waiting: Dict[int, _Chat] = {}
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._accepting = False
+        self._stopped = False
+        self._seq = 0
+        self._swept_at = time.monotonic()
+        self.pending = 0
+        self.in_flight = 0
+        self.counters = {"queued": 0, "coalesced": 0, "sent": 0, "rate_limited": 0, "rejected": 0, "failed": 0}
+
+    def start(self, bot: Bot) -> None:
+        self.bot = bot
+        self._accepting = True
+        self._stopped = False
+        for index in range(self.senders):
+            thread = threading.Thread(target=self._run, name=f"outbox-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def send(
+        self, chat_id: int, text: str, group: bool = False, lane: int = DIRECT, coalesce: bool = False, **kwargs: Any
+    ) -> bool:
+        """Ставит сообщение в очередь; False, если очередь закрыта или переполнена пассивными ответами."""
+        reply_to = kwargs.pop("reply_to_message_id", None)
+        with self._condition:
+            if not self._accepting or (lane == self.PASSIVE and self.pending >= self.max_pending):
+                self.counters["rejected"] += 1
+                return False
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                rate = self.group_rate if group else self.chat_rate
+                chat = self._chats[chat_id] = _Chat(TokenBucket(rate, 1.0, time.monotonic()))
+            queue = chat.lanes[lane]
+            last = queue[-1] if queue else None
+            if coalesce and last is not None and last.coalesce and last.kwargs == kwargs:
+                if text == last.last_part:
+                    last.parts += 1
+                    self.counters["coalesced"] += 1
+                    return True
+                if len(last.text) + 2 + len(text) <= MAX_TEXT_LENGTH:
+                    last.text = f"{last.text}\n\n{text}"
+                    last.last_part = text
+                    last.parts += 1
+                    self.counters["coalesced"] += 1
+                    return True
+            self._seq += 1
+            queue.append(OutgoingMessage(self._seq, chat_id, text, kwargs, reply_to, lane, coalesce))
+            self._waiting[chat_id] = chat
+            self.pending += 1
+            self.counters["queued"] += 1
+            self._condition.notify()
+        return True
+
+    def stop(self, timeout: float) -> bool:
+        """Дожидается отправки очереди не дольше timeout секунд; True, если отправлено всё."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._accepting = False
+            while self.pending + self.in_flight and time.monotonic() < deadline:
+                self._condition.wait(deadline - time.monotonic())
+            drained = not (self.pending + self.in_flight)
+            self._stopped = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 1.0))
+        self._threads.clear()
+        if not drained:
+            logger.warning("Outbox stopped with %d messages not sent", self.pending)
+        return drained
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {**self.counters, "pending": self.pending, "chats": len(self._chats)}
+
+    def _pick(self, now: float) -> Tuple[Optional[Tuple[_Chat, OutgoingMessage]], float]:
+        """Следующее сообщение, которое можно отправить сейчас, или сколько ждать."""
+        wait = 1.0
+        best: Optional[_Chat] = None
+        best_key: Optional[Tuple[int, int]] = None
+        for chat in self._waiting.values():
+            if chat.in_flight:
+                continue
+            delay = max(chat.paused_until - now, chat.bucket.delay(now))
+            if delay > 0:
+                wait = min(wait, delay)
+                continue
+            head = chat.head()
+            key = (head.lane, head.seq)
+            if best_key is None or key < best_key:
+                best, best_key = chat, key
+        if best is None:
+            return None, wait
+        global_delay = self._global.delay(now)
+        if global_delay > 0:
+            return None, global_delay
+        self._global.take(now)
+        best.bucket.take(now)
+        message = best.lanes[best_key[0]].popleft()
+        best.in_flight = True
+        if best.head() is None:
+            del self._waiting[message.chat_id]
+        self.pending -= 1
+        self.in_flight += 1
+        return (best, message), 0.0
+
+    def _sweep(self, now: float) -> None:
+        # Чаты без очереди и с полным бакетом ничего не помнят, их можно забыть.
+        for chat_id in [
+            chat_id
+            for chat_id, chat in self._chats.items()
+            if chat_id not in self._waiting and not chat.in_flight and chat.bucket.full(now) and chat.paused_until <= now
+        ]:
+            del self._chats[chat_id]
+        self._swept_at = now
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    now = time.monotonic()
+                    if now - self._swept_at > 60:
+                        self._sweep(now)
+                    picked, wait = self._pick(now)
+                    if picked is not None:
+                        break
+                    self._condition.wait(wait)
+            chat, message = picked
+            retry_in = self._deliver(message)
+            with self._condition:
+                chat.in_flight = False
+                self.in_flight -= 1
+                if retry_in is not None:
+                    chat.paused_until = time.monotonic() + retry_in
+                    chat.lanes[message.lane].appendleft(message)
+                    self._waiting[message.chat_id] = chat
+                    self.pending += 1
+                self._condition.notify_all()
+
+    def _deliver(self, message: OutgoingMessage) -> Optional[float]:
+        """Отправляет сообщение; возвращает паузу перед повтором или None, если повтор не нужен."""
+        kwargs = dict(message.kwargs)
+        if message.reply_to is not None:
+            kwargs.update(reply_to_message_id=message.reply_to, allow_sending_without_reply=True)
+        try:
+            self.bot.send_message(chat_id=message.chat_id, text=message.text, **kwargs)
+        except RetryAfter as exc:
+            with self._condition:
+                self.counters["rate_limited"] += 1
+            logger.warning("Flood limit in chat %s, retrying in %s s", message.chat_id, exc.retry_after)
+            return float(exc.retry_after)
+        except (BadRequest, TimedOut) as exc:
+            # BadRequest не исправится повтором, а после TimedOut сообщение могло уже дойти.
+            self._failed(message, exc)
+        except NetworkError as exc:
+            message.attempts += 1
+            if message.attempts <= self.retries:
+                logger.warning("Failed to send to chat %s (%s), retrying", message.chat_id, exc)
+                return float(message.attempts)
+            self._failed(message, exc)
+        except TelegramError as exc:
+            self._failed(message, exc)
+        else:
+            with self._condition:
+                self.counters["sent"] += 1
+        return None
+
+    def _failed(self, message: OutgoingMessage, exc: Exception) -> None:
+        with self._condition:
+            self.counters["failed"] += 1
+        logger.error("Dropped message to chat %s: %s", message.chat_id, exc)
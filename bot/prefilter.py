@@ -0,0 +1,143 @@
+import logging
+import re
+import string
+import threading
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Как в распознавании воркера: латиница с символами, которые сворачиваются в ASCII (ı, ſ).
+_LATIN = frozenset(string.ascii_lowercase) | {"ı", "ſ"}
+_DIGITS = re.compile(r"\d+")
+
+
+def _fold(text: str) -> str:
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(char.lower()[0] for char in text)
+
+
+class MentionPrefilter:
+    """Дешёвая проверка, может ли в тексте быть упоминание суммы с валютой.
+
+    Повторяет необходимое условие распознавания воркера: группа цифр, рядом с
+    которой (через пробелы, дробную часть и суффикс суммы) стоит алиас, символ
+    валюты или три латинские буквы. Проверка с запасом: пропускает всё, что
+    воркер мог бы распознать, а отсеивает только заведомо пустые сообщения.
+    Алиасы, символы и суффиксы берутся из словаря воркера (GET /aliases).
+    """
+
+    def __init__(self, aliases: Mapping[str, Iterable[str]], symbols: Mapping[str, str], suffixes: Iterable[str]) -> None:
+        tokens = {alias.strip().lower() for code_aliases in aliases.values() for alias in code_aliases}
+        tokens.update(symbol.lower() for symbol in symbols)
+        tokens.discard("")
+        self.tokens = tuple(sorted(tokens, key=len, reverse=True))
+        currency = "|".join([*map(re.escape, self.tokens), "[a-zıſ]{3}"])
+        suffix = "|".join(re.escape(item.lower()) for item in suffixes if item)
+        optional_suffix = rf"(?:(?:{suffix})\s*)?" if suffix else ""
+        # Хвост после группы цифр: дробная часть, пробелы, суффикс, валюта.
+        self._after = re.compile(rf"[\d\s]*+(?:[.,]\d+)?\s*{optional_suffix}(?:{currency})")
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "MentionPrefilter":
+        return cls(payload["aliases"], payload["symbols"], payload["suffixes"])
+
+    def _currency_before(self, folded: str, start: int) -> bool:
+        end = start
+        while end > 0 and folded[end - 1].isspace():
+            end -= 1
+        if folded.endswith(self.tokens, 0, end):
+            return True
+        return end >= 3 and all(char in _LATIN for char in folded[end - 3 : end])
+
+    def may_contain_mention(self, text: str) -> bool:
+        folded = _fold(text)
+        scanned_to = 0
+        for digits in _DIGITS.finditer(folded):
+            start = digits.start()
+            if self._currency_before(folded, start):
+                return True
+            # Цифры внутри уже просмотренного хвоста дают тот же хвост.
+            if start >= scanned_to:
+                found = self._after.match(folded, digits.end())
+                if found is not None:
+                    return True
+                scanned_to = digits.end()
+                while scanned_to < len(folded) and (folded[scanned_to].isdecimal() or folded[scanned_to].isspace()):
+                    scanned_to += 1
+        return False
+
+
+class PrefilterStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+
+    def record(self, skipped: bool) -> int:
+        with self._lock:
+            self.checked += 1
+            self.skipped += skipped
+            return self.checked
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            checked, skipped = self.checked, self.skipped
+        return {"checked": checked, "skipped": skipped, "skipped_share": round(skipped / checked, 4) if checked else 0.0}
+
+
+class SharedPrefilter:
+    """Фильтр по словарю воркера, который периодически перечитывается.
+
+    Пока словарь не получен (воркер недоступен при старте), фильтр пропускает
+    все сообщения: лишний запрос к воркеру лучше потерянной конвертации.
+    Словарь пересобирается, только если содержимое ответа изменилось, так что
+    перезагрузка алиасов в воркере доходит до бота за refresh_interval.
+    """
+
+    def __init__(self, fetch: Callable[[], Dict[str, Any]], refresh_interval: float, report_every: int = 1000) -> None:
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.report_every = report_every
+        self.stats = PrefilterStats()
+        self._filter: Optional[MentionPrefilter] = None
+        self._payload: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> bool:
+        try:
+            payload = self.fetch()
+        except Exception as exc:
+            logger.warning("Failed to fetch the alias dictionary (%s), prefilter keeps the previous one", exc)
+            return False
+        payload = {key: payload[key] for key in ("aliases", "symbols", "suffixes")}
+        if payload != self._payload:
+            self._filter = MentionPrefilter.from_payload(payload)
+            self._payload = payload
+            logger.info("Prefilter loaded %d currency tokens", len(self._filter.tokens))
+        return True
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="prefilter-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        # Пока словаря нет, пробуем чаще, чтобы фильтр заработал вскоре после старта воркера.
+        while not self._stop.is_set():
+            loaded = self.refresh()
+            wait = self.refresh_interval if loaded or self._filter is not None else min(self.refresh_interval, 10.0)
+            self._stop.wait(wait)
+
+    def should_skip(self, text: str) -> bool:
+        """True, если в тексте точно нет упоминаний и вызывать воркер незачем."""
+        current = self._filter
+        skipped = current is not None and not current.may_contain_mention(text)
+        checked = self.stats.record(skipped)
+        if self.report_every and checked % self.report_every == 0:
+            logger.info("Prefilter: %s", self.stats.snapshot())
+        return skipped
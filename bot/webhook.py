@@ -0,0 +1,162 @@
+import json
+import logging
+import queue
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import Dispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadedHTTPServer(ThreadingHTTPServer):
+    # Telegram держит до max_connections соединений; стандартной очереди в 5 не хватает.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class UpdatePipeline:
+    """Ограниченная очередь входящих обновлений и пул потоков, которые их обрабатывают.
+
+    submit не ждёт дольше put_timeout: при полной очереди обновление
+    отклоняется, и вебхук отвечает 503, так что Telegram доставит его позже.
+    drain перестаёт принимать новые обновления и дорабатывает уже принятые.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, workers: int, queue_size: int, put_timeout: float = 0.5) -> None:
+        self.dispatcher = dispatcher
+        self.workers = workers
+        self.put_timeout = put_timeout
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = []
+        self._accepting = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        self._stopped.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"update-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._accepting.set()
+
+    def submit(self, data: Dict[str, Any]) -> bool:
+        if not self._accepting.is_set():
+            return False
+        try:
+            self._queue.put(data, timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.accepted += 1
+        return True
+
+    def drain(self, timeout: float) -> bool:
+        """Дорабатывает очередь не дольше timeout секунд; True, если успели всё."""
+        self._accepting.clear()
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        drained = not self._queue.unfinished_tasks
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0.1))
+        self._threads.clear()
+        if not drained:
+            logger.warning("Stopped with %d updates not processed", self._queue.qsize())
+        return drained
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "processed": self.processed,
+                "failed": self.failed,
+            }
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                data = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                self.dispatcher.process_update(Update.de_json(data, self.dispatcher.bot))
+            except Exception:
+                logger.exception("Failed to process update %s", data.get("update_id"))
+                with self._lock:
+                    self.failed += 1
+            else:
+                with self._lock:
+                    self.processed += 1
+            finally:
+                self._queue.task_done()
+
+
+class WebhookServer:
+    """HTTP-приёмник вебхука Telegram: POST на path с телом Update, ответ 200 или 503."""
+
+    def __init__(
+        self, pipeline: UpdatePipeline, listen: str, port: int, path: str, secret_token: Optional[str] = None
+    ) -> None:
+        self.pipeline = pipeline
+        self.path = path
+        self.secret_token = secret_token
+        self._server = ThreadedHTTPServer((listen, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format, *args)
+
+            def _reply(self, status: int) -> None:
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                if status == 503:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path != server.path:
+                    return self._reply(404)
+                token = self.headers.get("X-Telegram-Bot-Api-Secret-Token") or ""
+                if server.secret_token and not secrets.compare_digest(token, server.secret_token):
+                    return self._reply(403)
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    return self._reply(400)
+                self._reply(200 if server.pipeline.submit(data) else 503)
+
+        return Handler
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="webhook", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
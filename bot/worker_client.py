@@ -0,0 +1,106 @@
+import logging
+import random
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+Timeout = Union[float, Tuple[float, float]]
+
+# Ответы, при которых воркер не обработал запрос и его можно повторить.
+RETRY_STATUSES = {503, 504}
+
+
+def _not_connected(error: requests.RequestException) -> bool:
+    """True, если запрос не ушёл: соединение не открылось за таймаут или воркер его отклонил."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError):
+        return False
+    # requests заворачивает ошибку urllib3: MaxRetryError с причиной NewConnectionError.
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class WorkerClient:
+    """HTTP-клиент к воркеру: общий пул keep-alive соединений на все потоки бота.
+
+    Запрос повторяется до retries раз с экспоненциальной паузой и полным
+    джиттером. GET повторяется при любой сетевой ошибке и ответах 503/504,
+    POST - только если новое соединение не удалось открыть (таймаут или отказ
+    в соединении): после обрыва уже открытого соединения воркер мог получить
+    тело и записать конвертацию в историю.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = 16,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _retryable(self, method: str, error: Optional[requests.RequestException], status: Optional[int]) -> bool:
+        if error is not None:
+            if method == "GET":
+                return True
+            return _not_connected(error)
+        return method == "GET" and status in RETRY_STATUSES
+
+    def _pause(self, attempt: int) -> None:
+        time.sleep(random.uniform(0, self.backoff * 2**attempt))
+
+    def send(self, method: str, endpoint: str, timeout: Optional[Timeout] = None, **kwargs: Any) -> requests.Response:
+        url = f"{self.base_url}{endpoint}"
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.RequestException as exc:
+                if attempt >= self.retries or not self._retryable(method, exc, None):
+                    raise
+                logger.warning("%s %s failed (%s), retrying", method, endpoint, exc)
+            else:
+                if attempt >= self.retries or not self._retryable(method, None, response.status_code):
+                    response.raise_for_status()
+                    return response
+                logger.warning("%s %s returned %d, retrying", method, endpoint, response.status_code)
+                response.close()
+            self._pause(attempt)
+            attempt += 1
+
+    def request(self, method: str, endpoint: str, timeout: Optional[Timeout] = None, **kwargs: Any) -> Dict[str, Any]:
+        return self.send(method, endpoint, timeout=timeout, **kwargs).json()
+
+    def get_if_changed(
+        self, endpoint: str, params: Optional[Dict[str, Any]] = None, etag: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Условный GET: (etag, None), если ресурс не изменился с версии etag."""
+        headers = {"If-None-Match": etag} if etag else {}
+        response = self.send("GET", endpoint, params=params, headers=headers)
+        if response.status_code == 304:
+            return etag, None
+        return response.headers.get("ETag"), response.json()
+
+    def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[Timeout] = None) -> Dict[str, Any]:
+        return self.request("GET", endpoint, timeout=timeout, params=params)
+
+    def post(self, endpoint: str, payload: Dict[str, Any], timeout: Optional[Timeout] = None) -> Dict[str, Any]:
+        return self.request("POST", endpoint, timeout=timeout, json=payload)
+
+    def close(self) -> None:
+        self.session.close()
@@ -69,6 +69,16 @@ def load_history_cached(limit: int, force_refresh: bool = False):
     except requests.ConnectionError:
         return None
 
+@st.cache_data(ttl=5)
+def load_stats_cached(force_refresh: bool = False):
+    try:
+        response = requests.get(f'{API_BASE_URL}/stats', params={'granularity': 'day', 'max_buckets': 0}, timeout=10)
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except requests.ConnectionError:
+        return None
+
 if 'force_refresh' not in st.session_state:
     st.session_state.force_refresh = False
 
@@ -77,6 +87,7 @@ if refresh_clicked:
     st.cache_data.clear()  
 
 history_data = load_history_cached(limit, st.session_state.force_refresh)
+stats_data = load_stats_cached(st.session_state.force_refresh)
 
 st.session_state.force_refresh = False
 
@@ -108,9 +119,12 @@ if history_data and history_data.get('conversions'):
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Всего операций", len(conversions))
+        st.metric("Всего операций", stats_data['total_count'] if stats_data else "—")
     with col2:
-        usd_conversions = df[df['quote_currency'] == 'USD'].shape[0]
+        if stats_data:
+            usd_conversions = sum(pair['count'] for pair in stats_data['pairs'] if pair['quote_currency'] == 'USD')
+        else:
+            usd_conversions = "—"
         st.metric("Конвертаций в USD", usd_conversions)
     with col3:
         if not df.empty:
@@ -0,0 +1,26 @@
+"""Загрузка истории курсов из дневных JSON-файлов в формате ЦБ.
+
+    python -m app.backfill_rates archive/2024 archive/2025/01/09/daily_json.js
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+
+from .db import init_db
+from .services.rate_history import backfill
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Backfill daily rate history from CBR-style JSON files")
+    parser.add_argument("paths", nargs="+", help="JSON files or directories to scan recursively")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    loaded = backfill(args.paths)
+    logging.getLogger(__name__).info("Stored rates for %d days", loaded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Распознавание упоминаний валют в большом архиве текстов на всех ядрах.
+
+Вход - текст по строке на сообщение или JSONL с полем --field; выход - CSV
+со столбцами index,start,end,amount,currency,match_text (index - номер строки входа).
+
+    python -m app.bulk_extract messages.jsonl --output mentions.csv --workers 8
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+from pathlib import Path
+import sys
+import time
+from typing import Iterator, List
+
+from .services.bulk_extraction import BulkExtractor
+from .services.currency_extractor import load_dictionary
+
+
+def _read_texts(path: Path, field: str | None, sink: List[str]) -> Iterator[str]:
+    # Тексты попадают и в sink: match_text восстанавливается из них по start/end.
+    with path.open(encoding="utf-8") as source:
+        for line in source:
+            text = (json.loads(line).get(field) or "") if field else line.rstrip("\n")
+            sink.append(text)
+            yield text
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Extract currency mentions from a large text archive in parallel")
+    parser.add_argument("input", type=Path, help="text file, one message per line, or JSONL with --field")
+    parser.add_argument("--field", help="JSONL field with the message text")
+    parser.add_argument("--output", type=Path, help="CSV file (stdout by default)")
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--aliases", help="alias dictionary JSON (built-in by default)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+    load_dictionary(args.aliases)
+    extractor = BulkExtractor(args.workers, args.chunk_size)
+
+    output = args.output.open("w", encoding="utf-8", newline="") if args.output else sys.stdout
+    texts: List[str] = []
+    offset = 0
+    mentions = 0
+    started = time.perf_counter()
+    try:
+        writer = csv.writer(output)
+        writer.writerow(["index", "start", "end", "amount", "currency", "match_text"])
+        for columns in extractor.iter_columns(_read_texts(args.input, args.field, texts)):
+            for index, mention in columns.rows(texts, offset):
+                writer.writerow([index, mention.start, mention.end, mention.amount, mention.currency, mention.match_text])
+            mentions += len(columns)
+            # Пачки приходят по порядку: тексты разобранной пачки больше не нужны.
+            consumed = min(extractor.chunk_size, len(texts))
+            del texts[:consumed]
+            offset += consumed
+    finally:
+        extractor.shutdown()
+        if args.output:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Processed %d texts, %d mentions in %.1f s (%.0f texts/s, %d workers)",
+        offset,
+        mentions,
+        elapsed,
+        offset / elapsed if elapsed else 0.0,
+        extractor.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
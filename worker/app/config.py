@@ -5,13 +5,36 @@ from typing import List
 class Settings(BaseSettings):
     app_name: str = "Currency Text Analyzer API"
     database_url: str
+    async_database_url: str | None = None
+    db_pool_size: int = 20
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 10.0
+    db_pool_recycle: int = 1800
     currency_rates_url: str = "https://www.cbr-xml-daily.ru/daily_json.js"
     request_timeout: int = 10
+    rates_http_max_connections: int = 10
     currency_cache_ttl: int = 600
+    currency_cache_hard_ttl: int = 3600
+    currency_retry_interval: int = 30
+    historical_rates_max_gap_days: int = 10
+    conversion_log_queue_size: int = 10000
+    conversion_log_batch_size: int = 500
+    conversion_log_flush_interval: float = 1.0
+    conversion_log_put_timeout: float = 0.05
+    detection_cache_size: int = 10000
+    detection_cache_ttl: float = 3600.0
+    detection_max_mentions: int = 500
+    detection_stream_buffer: int = 65536
+    currency_aliases_path: str | None = None
+    currency_aliases_check_interval: float = 5.0
+    bulk_workers: int | None = None
+    bulk_chunk_size: int = 500
     reference_currency: str = "RUB"
     primary_quote_currency: str = "RUB"
     secondary_quote_currency: str | None = "USD"
     additional_quote_currencies: List[str] = ["EUR", "CNY", "KZT"]
+    admin_token: str | None = None
+    profiler_max_seconds: int = 60
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,9 +1,13 @@
-from typing import Generator
+import time
+from typing import Any, AsyncGenerator, Dict, Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from .config import get_settings
+from .metrics import DB_POOL_CHECKOUT_SECONDS
 
 
 class Base(DeclarativeBase):
@@ -11,9 +15,60 @@ class Base(DeclarativeBase):
 
 
 settings = get_settings()
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def _async_database_url(url: str) -> str:
+    """URL базы для асинхронного драйвера: postgresql -> asyncpg, sqlite -> aiosqlite."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.get_driver_name() == driver:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+class _CheckoutTimer:
+    """Примесь к пулу: пишет в метрики, сколько ждали соединение."""
+
+    engine_label = ""
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()  # type: ignore[misc]
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.engine_label).observe(time.perf_counter() - started)
+
+
+class _TimedQueuePool(_CheckoutTimer, QueuePool):
+    engine_label = "sync"
+
+
+class _TimedAsyncQueuePool(_CheckoutTimer, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+
+def _pool_options(url: str, poolclass: type[QueuePool]) -> Dict[str, Any]:
+    options: Dict[str, Any] = {"pool_pre_ping": True}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=poolclass,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+    return options
+
+
+engine = create_engine(settings.database_url, **_pool_options(settings.database_url, _TimedQueuePool))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+async_database_url = settings.async_database_url or _async_database_url(settings.database_url)
+async_engine = create_async_engine(async_database_url, **_pool_options(async_database_url, _TimedAsyncQueuePool))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db() -> Generator:
     session = SessionLocal()
@@ -21,3 +76,18 @@ def get_db() -> Generator:
         yield session
     finally:
         session.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def init_db() -> None:
+    """Создаёт недостающие таблицы вместе с их индексами.
+
+    Уже существующие таблицы не меняются: новые колонки и индексы добавляет
+    python -m app.migrate, его запускают один раз перед выкладкой.
+    """
+    from . import models  # noqa: F401  регистрирует таблицы в Base.metadata
+    Base.metadata.create_all(bind=engine)
@@ -0,0 +1,93 @@
+"""Распознавание и конвертация сумм из архива экспорта Telegram (result.json).
+
+Конвертация идёт по курсам на дату сообщения (история из app.backfill_rates),
+без истории - по текущему снимку. Результат пишется в currency_conversions,
+CSV или каталог Parquet. После каждой пачки сохраняется контрольная точка,
+повторный запуск с теми же аргументами продолжает с неё.
+
+    python -m app.import_archive export/result.json --output conversions.csv
+    python -m app.import_archive export/result.json --db --workers 8
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+from pathlib import Path
+
+from .config import get_settings
+from .db import init_db
+from .services.archive_import import Checkpoint, CsvSink, DatabaseSink, ParquetSink, run_import
+from .services.bulk_extraction import BulkExtractor
+from .services.currency_extractor import load_dictionary
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Detect and convert currency amounts in a Telegram export archive")
+    parser.add_argument("archive", type=Path, help="result.json of a chat or a full account export")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--db", action="store_true", help="write to currency_conversions")
+    target.add_argument("--output", type=Path, help="CSV file, or a directory for --format parquet")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--checkpoint", type=Path, help="checkpoint file (next to the output by default)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start over")
+    parser.add_argument("--batch-size", type=int, default=5000, help="messages per batch and checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes, all cores by default")
+    parser.add_argument("--historical-only", action="store_true", help="skip amounts without stored daily rates")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+    checkpoint_path = args.checkpoint or (
+        args.archive.with_name(args.archive.name + ".import.json")
+        if args.db
+        else args.output.with_name(args.output.name + ".checkpoint.json")
+    )
+    if args.restart:
+        checkpoint_path.unlink(missing_ok=True)
+    try:
+        checkpoint = Checkpoint.load(checkpoint_path, args.archive)
+    except ValueError as exc:
+        parser.error(f"{exc}; use --restart to start over")
+    if checkpoint.stats.position:
+        logger.info("Resuming from element %d (%d rows written)", checkpoint.stats.position, checkpoint.stats.rows)
+
+    load_dictionary(get_settings().currency_aliases_path)
+    init_db()
+    if args.db:
+        sink = DatabaseSink()
+    elif args.format == "parquet":
+        try:
+            sink = ParquetSink(args.output)
+        except RuntimeError as exc:
+            parser.error(str(exc))
+    else:
+        sink = CsvSink(args.output, checkpoint.sink)
+    extractor = BulkExtractor(args.workers)
+    try:
+        stats = run_import(
+            checkpoint,
+            sink,
+            extractor,
+            batch_size=args.batch_size,
+            historical_only=args.historical_only,
+            progress_interval=args.progress_interval,
+        )
+    finally:
+        extractor.shutdown()
+        sink.close()
+
+    logger.info(
+        "Done: %d messages, %d mentions, %d rows (%d by historical rates, %d without a rate) in %.1f s, %.0f messages/s",
+        stats.messages,
+        stats.mentions,
+        stats.rows,
+        stats.historical_rows,
+        stats.unconverted,
+        stats.seconds,
+        stats.messages / stats.seconds if stats.seconds else 0.0,
+    )
+
+
+if __name__ == "__main__":
+    main()
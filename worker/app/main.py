@@ -1,30 +1,81 @@
 from __future__ import annotations
 
-from typing import List
+import asyncio
+import base64
+import codecs
+from datetime import datetime, timezone
+import logging
+import secrets
+import time
+from typing import Any, AsyncIterator, Literal
 
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+import orjson
+from starlette.requests import ClientDisconnect
+from starlette.types import Receive, Scope, Send
+from sqlalchemy import Row, select, tuple_
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import models
 from .config import get_settings
-from .db import Base, engine, get_db
+from .db import async_engine, get_async_db, init_db
+from .metrics import (
+    CONTENT_TYPE_LATEST,
+    DETECTED_MENTIONS,
+    DETECTION_STREAM_FORCED_CUTS,
+    generate_latest,
+    observe_stage,
+)
 from .schemas import (
     
+    AliasDictionaryResponse,
+    BulkExtractionRequest,
+    BulkExtractionResponse,
     ConversionRequest,
     ConversionResponse,
-    CurrencyConversionDetail,
+    CurrencyDetectionBatchRequest,
+    CurrencyDetectionBatchResponse,
     CurrencyDetectionRequest,
     CurrencyDetectionResponse,
-    DetectedCurrency,
+    HistoricalConversionRequest,
+    HistoricalConversionResponse,
+    HistoricalConversionResult,
     HistoryResponse,
+    PairStats,
+    RatesResponse,
+    StatsBucket,
+    StatsResponse,
 )
 
-from .services.currency import CurrencyServiceError, convert_currency
-from .services.currency_extractor import extract_currency_mentions
+from .services.bulk_extraction import BulkExtractor
+from .services.conversion_log import conversion_log
+from .services.currency import (
+    CurrencyServiceError,
+    RateTable,
+    close_async_client,
+    convert_currency,
+    convert_many,
+    get_rate_table_async,
+)
+from .services.profiler import ProfilerBusy, collapse, sample_stacks
+from .services.rollups import apply_rollups, read_stats
+from .services.rate_history import HistoricalRatesUnavailable, convert_historical, get_historical_table
+from .services.currency_extractor import (
+    CurrencyMention,
+    DictionaryWatcher,
+    StreamingExtractor,
+    get_dictionary,
+    load_dictionary,
+)
+from .services.detection_cache import detection_cache
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
+bulk_extractor = BulkExtractor(settings.bulk_workers, settings.bulk_chunk_size)
+aliases_watcher = DictionaryWatcher(settings.currency_aliases_path, settings.currency_aliases_check_interval)
 
 app = FastAPI(title=settings.app_name)
 app.add_middleware(
@@ -38,23 +89,133 @@ app.add_middleware(
 
 @app.on_event("startup")
 def on_startup() -> None:
-    Base.metadata.create_all(bind=engine)
+    load_dictionary(settings.currency_aliases_path)
+    aliases_watcher.start()
+    init_db()
+    conversion_log.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    aliases_watcher.stop()
+    await asyncio.to_thread(conversion_log.stop)
+    await asyncio.to_thread(bulk_extractor.shutdown)
+    await close_async_client()
+    await async_engine.dispose()
 
 
 @app.get("/health")
-def healthcheck() -> dict[str, str]:
+async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/conversion-log/stats")
+async def conversion_log_stats() -> dict[str, int | float]:
+    return conversion_log.stats()
+
+
+@app.get("/detection-cache/stats")
+async def detection_cache_stats() -> dict[str, dict[str, int | float]]:
+    return detection_cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    if not settings.admin_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="forbidden")
+
+
+@app.get("/aliases", response_model=AliasDictionaryResponse)
+async def aliases() -> Response:
+    """Текущий словарь распознавания; по нему бот отсеивает сообщения без упоминаний валют."""
+    dictionary = get_dictionary()
+    return _json_response({"version": dictionary.version, **dictionary.tables()})
+
+
+@app.post("/admin/aliases/reload", dependencies=[Depends(require_admin)])
+async def reload_aliases() -> dict[str, int]:
+    """Перечитывает словарь алиасов из CURRENCY_ALIASES_PATH; при ошибке остаётся прежний.
+
+    Словарь подменяется сразу только в процессе, принявшем запрос. Остальные
+    процессы воркера замечают изменённый файл сами, не позже чем через
+    CURRENCY_ALIASES_CHECK_INTERVAL секунд (0 отключает проверку).
+    """
+    try:
+        dictionary = await asyncio.to_thread(load_dictionary, settings.currency_aliases_path)
+    except (OSError, ValueError) as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
+    return dictionary.stats()
+
+
+@app.post("/debug/profile", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def profile(seconds: float = 10.0, interval_ms: float = 5.0) -> Response:
+    """Семплирует стеки всех потоков воркера seconds секунд и отдаёт их в свёрнутом формате flamegraph."""
+    seconds = max(min(seconds, settings.profiler_max_seconds), 0.1)
+    interval = max(interval_ms, 1.0) / 1000
+    try:
+        counts = await asyncio.to_thread(sample_stacks, seconds, interval)
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    return Response(collapse(counts), media_type="text/plain")
+
+
+
+
+
+def _currency_codes(value: str) -> list[str]:
+    return list(dict.fromkeys(code.strip().upper() for code in value.split(",") if code.strip()))
+
+
+@app.get("/rates", response_model=RatesResponse)
+async def read_rates(request: Request, base: str, quotes: str | None = None) -> Response:
+    """Кросс-курсы base x quotes (списки через запятую) из текущего снимка, без записи в историю.
 
+    ETag - версия снимка: клиент с If-None-Match получает 304, пока курсы не сменились.
+    """
+    try:
+        table = await get_rate_table_async()
+    except CurrencyServiceError as exc:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
+    bases = _currency_codes(base)
+    quote_codes = _currency_codes(quotes) if quotes else list(table.codes)
+    unknown = [code for code in dict.fromkeys(bases + quote_codes) if code not in table.index]
+    if not bases or unknown:
+        detail = f"unsupported currencies: {', '.join(unknown)}" if unknown else "base is empty"
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
+
+    etag = f'"{table.version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    rows = table.matrix[[table.index[code] for code in bases]][:, [table.index[code] for code in quote_codes]]
+    rates = {code: dict(zip(quote_codes, row)) for code, row in zip(bases, rows.tolist())}
+    response = _json_response({"version": table.version, "snapshot_id": table.snapshot_id, "rates": rates})
+    response.headers.update(headers)
+    return response
 
 
 @app.post("/convert", response_model=ConversionResponse, status_code=status.HTTP_201_CREATED)
-def convert(
-    payload: ConversionRequest, session: Session = Depends(get_db)
+async def convert(
+    payload: ConversionRequest, session: AsyncSession = Depends(get_async_db)
 ) -> models.CurrencyConversion:
+    rate_date = None
+    started = time.perf_counter()
     try:
-        rate, converted = convert_currency(payload.amount, payload.base_currency, payload.quote_currency)
+        if payload.as_of is None:
+            table = await get_rate_table_async()
+        else:
+            rate_date, table = await asyncio.to_thread(get_historical_table, payload.as_of)
+        started = observe_stage("convert", "rates", started)
+        rate, converted = convert_currency(payload.amount, payload.base_currency, payload.quote_currency, table)
+        started = observe_stage("convert", "convert", started)
+    except HistoricalRatesUnavailable as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
     except CurrencyServiceError as exc:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
 
@@ -64,23 +225,59 @@ def convert(
         quote_currency=payload.quote_currency.upper(),
         rate=rate,
         converted_amount=converted,
+        rate_snapshot_id=table.snapshot_id,
+        rate_date=rate_date,
+        created_at=datetime.now(timezone.utc),
     )
+    rollup_row = {
+        "created_at": db_item.created_at,
+        "base_currency": db_item.base_currency,
+        "quote_currency": db_item.quote_currency,
+        "amount": db_item.amount,
+        "converted_amount": db_item.converted_amount,
+    }
     try:
         session.add(db_item)
-        session.commit()
-        session.refresh(db_item)
+        await session.run_sync(apply_rollups, [rollup_row])
+        await session.commit()
+        await session.refresh(db_item)
     except SQLAlchemyError as exc:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="database error") from exc
+    observe_stage("convert", "db", started)
     return db_item
 
 
-@app.post("/detect-currencies", response_model=CurrencyDetectionResponse)
-def detect_currencies(
-    payload: CurrencyDetectionRequest, 
-    session: Session = Depends(get_db)
-) -> CurrencyDetectionResponse:
-    primary_currency = (payload.quote_currency or settings.primary_quote_currency).upper()
+@app.post("/convert/historical", response_model=HistoricalConversionResponse)
+async def convert_historical_batch(payload: HistoricalConversionRequest) -> HistoricalConversionResponse:
+    try:
+        rate_dates, rates, converted = await asyncio.to_thread(
+            convert_historical,
+            [item.amount for item in payload.items],
+            [item.base_currency for item in payload.items],
+            [item.quote_currency for item in payload.items],
+            [item.as_of for item in payload.items],
+        )
+    except CurrencyServiceError as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
+
+    results = [
+        HistoricalConversionResult(
+            amount=item.amount,
+            base_currency=item.base_currency.upper(),
+            quote_currency=item.quote_currency.upper(),
+            as_of=item.as_of,
+            rate_date=rate_date,
+            rate=None if rate != rate else rate,
+            converted_amount=None if amount != amount else amount,
+        )
+        for item, rate_date, rate, amount in zip(payload.items, rate_dates, rates.tolist(), converted.tolist())
+    ]
+    return HistoricalConversionResponse(results=results)
+
+
+def _target_currencies(quote_currency: str | None) -> list[str]:
+    primary_currency = (quote_currency or settings.primary_quote_currency).upper()
     target_currencies: list[str] = []
     for code in (primary_currency, settings.secondary_quote_currency):
         if not code:
@@ -94,74 +291,362 @@ def detect_currencies(
         normalized = code.upper()
         if normalized not in target_currencies:
             target_currencies.append(normalized)
-    
-    mentions = extract_currency_mentions(payload.text)
-    items: list[DetectedCurrency] = []
-    
+    return target_currencies
+
+
+def _json_response(content: Any) -> Response:
+    """JSON-ответ из внутренних данных, уже совпадающих со схемой: без повторной валидации моделями ответа."""
+    return Response(orjson.dumps(content, option=orjson.OPT_UTC_Z), media_type="application/json")
+
+
+def _detected_item(mention: CurrencyMention, conversions: list[dict[str, Any]]) -> dict[str, Any]:
+    """DetectedCurrency в виде словаря для _json_response."""
+    return {
+        "source_amount": mention.amount,
+        "source_currency": mention.currency,
+        "conversions": conversions,
+        "match_text": mention.match_text,
+        "start_index": mention.start,
+        "end_index": mention.end,
+    }
+
+
+def _detected_items(
+    mentions: list[CurrencyMention], target_currencies: list[str], table: RateTable, created_at: datetime
+) -> tuple[list[dict[str, Any]], list[dict]]:
+    items: list[dict[str, Any]] = []
+    rows: list[dict] = []
     for mention in mentions:
-        conversions: list[CurrencyConversionDetail] = []
-        
-     
+        conversions: list[dict[str, Any]] = []
+
         valid_targets = [c for c in target_currencies if c != mention.currency]
-        
+
         for quote_currency in valid_targets:
             try:
-                rate, converted = convert_currency(mention.amount, mention.currency, quote_currency)
+                rate, converted = convert_currency(mention.amount, mention.currency, quote_currency, table)
             except CurrencyServiceError:
                 continue
-            
-          
-            db_item = models.CurrencyConversion(
-                amount=mention.amount,
-                base_currency=mention.currency.upper(),
-                quote_currency=quote_currency.upper(),
-                rate=rate,
-                converted_amount=converted,
-            )
-            try:
-                session.add(db_item)
-                session.commit()
-            
-            except SQLAlchemyError as exc:
-                session.rollback()
-          
-                logger.error(f"Failed to save conversion to DB: {exc}")
-            
-            conversions.append(
-                CurrencyConversionDetail(
-                    quote_currency=quote_currency,
-                    converted_amount=converted,
-                    rate=rate,
-                )
+
+            rows.append(
+                {
+                    "amount": mention.amount,
+                    "base_currency": mention.currency.upper(),
+                    "quote_currency": quote_currency.upper(),
+                    "rate": rate,
+                    "converted_amount": converted,
+                    "rate_snapshot_id": table.snapshot_id,
+                    "created_at": created_at,
+                }
             )
-        
+
+            conversions.append({"quote_currency": quote_currency, "converted_amount": converted, "rate": rate})
+
         if not conversions:
             continue
-        items.append(
-            DetectedCurrency(
-                source_amount=mention.amount,
-                source_currency=mention.currency,
-                conversions=conversions,
-                match_text=mention.match_text,
-                start_index=mention.start,
-                end_index=mention.end,
-            )
-        )
+        items.append(_detected_item(mention, conversions))
+    return items, rows
+
+
+@app.post("/detect-currencies", response_model=CurrencyDetectionResponse)
+async def detect_currencies(payload: CurrencyDetectionRequest) -> Response:
+    target_currencies = _target_currencies(payload.quote_currency)
+    
+    started = time.perf_counter()
+    text_key = detection_cache.text_key(payload.text)
+    mentions = detection_cache.mentions(text_key, payload.text)[: settings.detection_max_mentions]
+    started = observe_stage("detect_currencies", "extract", started)
+    DETECTED_MENTIONS.observe(len(mentions))
+    created_at = datetime.now(timezone.utc)
+    if not mentions:
+        return _json_response({"items": []})
+    try:
+        table = await get_rate_table_async()
+    except CurrencyServiceError:
+        logger.exception("Failed to fetch rates for detection")
+        return _json_response({"items": []})
+    started = observe_stage("detect_currencies", "rates", started)
+    cached = detection_cache.get_response(text_key, target_currencies, table)
+    if cached is not None:
+        body, cached_rows = cached
+        await conversion_log.submit_async([dict(row, created_at=created_at) for row in cached_rows])
+        observe_stage("detect_currencies", "cached", started)
+        return Response(body, media_type="application/json")
     
-    return CurrencyDetectionResponse(items=items)
+    items, rows = _detected_items(mentions, target_currencies, table, created_at)
+    response = _json_response({"items": items})
+    detection_cache.put_response(text_key, target_currencies, table, (response.body, rows))
+    started = observe_stage("detect_currencies", "convert", started)
+    await conversion_log.submit_async(rows)
+    observe_stage("detect_currencies", "enqueue", started)
+    return response
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse, который сам не читает receive: тело запроса дочитывает генератор ответа."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+
+
+@app.post("/detect-currencies/stream")
+async def detect_currencies_stream(request: Request, quote_currency: str | None = None) -> StreamingResponse:
+    """Распознавание в длинном тексте, присланном потоком (text/plain, UTF-8, можно chunked).
+
+    Ответ - NDJSON: по одному DetectedCurrency на строку по мере разбора, смещения
+    абсолютные от начала документа. Все суммы считаются по одному снимку курсов.
+
+    Текст режется на части только между словами, через которые не проходит ни
+    одно упоминание. Если такой границы нет на DETECTION_STREAM_BUFFER символов
+    (например, сплошной столбец сумм), часть режется по последнему пробелу, и
+    упоминание на разрезе может разделиться или потеряться; такие разрезы видны
+    в метрике worker_detection_stream_forced_cuts_total и в журнале.
+    """
+    target_currencies = _target_currencies(quote_currency)
+    try:
+        table = await get_rate_table_async()
+    except CurrencyServiceError as exc:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
+
+    async def results() -> AsyncIterator[bytes]:
+        extractor = StreamingExtractor(settings.detection_stream_buffer)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        def parse(chunk: bytes, final: bool) -> tuple[list[bytes], list[dict]]:
+            forced_cuts = extractor.forced_cuts
+            mentions = extractor.feed(decoder.decode(chunk, final=final))
+            if extractor.forced_cuts != forced_cuts:
+                DETECTION_STREAM_FORCED_CUTS.inc(extractor.forced_cuts - forced_cuts)
+            if final:
+                mentions += extractor.close()
+                if extractor.forced_cuts:
+                    logger.warning(
+                        "Stream cut %d times without a safe boundary (buffer %d chars), mentions at the cuts may be split",
+                        extractor.forced_cuts,
+                        extractor.max_buffer,
+                    )
+            if not mentions:
+                return [], []
+            DETECTED_MENTIONS.observe(len(mentions))
+            items, rows = _detected_items(mentions, target_currencies, table, datetime.now(timezone.utc))
+            return [orjson.dumps(item) + b"\n" for item in items], rows
+
+        async def lines(chunk: bytes, final: bool = False) -> list[bytes]:
+            # Разбор куска может занять сотни миллисекунд (граница не находится
+            # до max_buffer символов), поэтому он идёт в пуле потоков.
+            result, rows = await asyncio.to_thread(parse, chunk, final)
+            if rows:
+                await conversion_log.submit_async(rows)
+            return result
+
+        try:
+            async for chunk in request.stream():
+                for line in await lines(chunk):
+                    yield line
+        except ClientDisconnect:
+            return
+        for line in await lines(b"", final=True):
+            yield line
+
+    return _DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+BatchPairs = tuple[list[float], list[str], list[str], list[list[tuple[CurrencyMention, int, int]]]]
+
+
+def _batch_mentions(items: list[CurrencyDetectionRequest]) -> BatchPairs:
+    """Упоминания всех текстов пачки и плоские списки пар для convert_many."""
+    amounts: list[float] = []
+    bases: list[str] = []
+    quotes: list[str] = []
+    detected: list[list[tuple[CurrencyMention, int, int]]] = []
+    for item in items:
+        target_currencies = _target_currencies(item.quote_currency)
+        spans: list[tuple[CurrencyMention, int, int]] = []
+        item_mentions = detection_cache.mentions(detection_cache.text_key(item.text), item.text)
+        for mention in item_mentions[: settings.detection_max_mentions]:
+            first = len(quotes)
+            for quote_currency in target_currencies:
+                if quote_currency == mention.currency:
+                    continue
+                amounts.append(mention.amount)
+                bases.append(mention.currency)
+                quotes.append(quote_currency)
+            spans.append((mention, first, len(quotes)))
+        DETECTED_MENTIONS.observe(len(spans))
+        detected.append(spans)
+    return amounts, bases, quotes, detected
+
+
+def _batch_response(pairs: BatchPairs, table: RateTable) -> tuple[Response, list[dict]]:
+    """Конвертация и сериализация ответа пачки вместе со строками для журнала конвертаций."""
+    amounts, bases, quotes, detected = pairs
+    rates, converted = convert_many(amounts, bases, quotes, table)
+    rates_list = rates.tolist()
+    converted_list = converted.tolist()
+    created_at = datetime.now(timezone.utc)
+
+    results: list[dict[str, Any]] = []
+    rows: list[dict] = []
+    for spans in detected:
+        items: list[dict[str, Any]] = []
+        for mention, first, last in spans:
+            conversions: list[dict[str, Any]] = []
+            for index in range(first, last):
+                rate = rates_list[index]
+                if rate != rate:
+                    continue
+                rows.append(
+                    {
+                        "amount": mention.amount,
+                        "base_currency": mention.currency,
+                        "quote_currency": quotes[index],
+                        "rate": rate,
+                        "converted_amount": converted_list[index],
+                        "rate_snapshot_id": table.snapshot_id,
+                        "created_at": created_at,
+                    }
+                )
+                conversions.append(
+                    {"quote_currency": quotes[index], "converted_amount": converted_list[index], "rate": rate}
+                )
+            if not conversions:
+                continue
+            items.append(_detected_item(mention, conversions))
+        results.append({"items": items})
+    return _json_response({"results": results}), rows
+
+
+@app.post("/detect-currencies/batch", response_model=CurrencyDetectionBatchResponse)
+async def detect_currencies_batch(payload: CurrencyDetectionBatchRequest) -> Response:
+    # Распознавание и сборка ответа на 1000 текстов занимают секунды, поэтому
+    # идут в пуле потоков, а в event loop остаются только ожидания.
+    started = time.perf_counter()
+    pairs = await asyncio.to_thread(_batch_mentions, payload.items)
+    started = observe_stage("detect_currencies_batch", "extract", started)
+
+    try:
+        table = await get_rate_table_async()
+    except CurrencyServiceError:
+        logger.exception("Failed to fetch rates for batch detection")
+        return _json_response({"results": [{"items": []} for _ in pairs[3]]})
+    started = observe_stage("detect_currencies_batch", "rates", started)
+    response, rows = await asyncio.to_thread(_batch_response, pairs, table)
+    started = observe_stage("detect_currencies_batch", "convert", started)
+    await conversion_log.submit_async(rows)
+    observe_stage("detect_currencies_batch", "enqueue", started)
+    return response
+
+
+@app.post("/detect-currencies/bulk", response_model=BulkExtractionResponse)
+async def detect_currencies_bulk(payload: BulkExtractionRequest) -> Response:
+    """Только распознавание, без конвертации и журнала: упоминания всех текстов по столбцам."""
+    started = time.perf_counter()
+    columns = await bulk_extractor.extract_columns_async(payload.texts)
+    observe_stage("detect_currencies_bulk", "extract", started)
+    return _json_response(
+        {
+            "text_index": columns.text_index.tolist(),
+            "start": columns.start.tolist(),
+            "end": columns.end.tolist(),
+            "amount": columns.amount.tolist(),
+            "currency": columns.currency,
+        }
+    )
+
+
+def _encode_cursor(conversion: Row) -> str:
+    raw = f"{conversion.created_at.isoformat()}|{conversion.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, conversion_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(conversion_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor") from exc
 
 
 @app.get("/history", response_model=HistoryResponse)
-def read_history(limit: int = 10, session: Session = Depends(get_db)) -> HistoryResponse:
-    limit = max(min(limit, 50), 1)
+async def read_history(
+    limit: int = 10,
+    cursor: str | None = None,
+    base_currency: str | None = None,
+    quote_currency: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    session: AsyncSession = Depends(get_async_db),
+) -> Response:
+    limit = max(min(limit, 100), 1)
+    conversion = models.CurrencyConversion
+    # Столбцы, а не ORM-объекты: строки сразу сериализуются в ConversionResponse.
+    query = select(
+        conversion.id,
+        conversion.amount,
+        conversion.base_currency,
+        conversion.quote_currency,
+        conversion.rate,
+        conversion.converted_amount,
+        conversion.rate_snapshot_id,
+        conversion.rate_date,
+        conversion.created_at,
+    )
+    if base_currency:
+        query = query.where(conversion.base_currency == base_currency.upper())
+    if quote_currency:
+        query = query.where(conversion.quote_currency == quote_currency.upper())
+    if created_from is not None:
+        query = query.where(conversion.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(conversion.created_at < created_to)
+    if cursor:
+        query = query.where(tuple_(conversion.created_at, conversion.id) < tuple_(*_decode_cursor(cursor)))
+    query = query.order_by(conversion.created_at.desc(), conversion.id.desc()).limit(limit + 1)
     try:
-        
-        conversions: List[models.CurrencyConversion] = (
-            session.query(models.CurrencyConversion)
-            .order_by(models.CurrencyConversion.created_at.desc())
-            .limit(limit)
-            .all()
+        conversions = (await session.execute(query)).all()
+    except SQLAlchemyError as exc:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="database error") from exc
+    next_cursor = _encode_cursor(conversions[limit - 1]) if len(conversions) > limit else None
+    return _json_response(
+        {"conversions": [row._asdict() for row in conversions[:limit]], "next_cursor": next_cursor}
+    )
+
+
+@app.get("/stats", response_model=StatsResponse)
+async def read_conversion_stats(
+    granularity: Literal["minute", "hour", "day"] = "day",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    base_currency: str | None = None,
+    quote_currency: str | None = None,
+    max_buckets: int = 1000,
+    session: AsyncSession = Depends(get_async_db),
+) -> StatsResponse:
+    try:
+        buckets, pairs = await session.run_sync(
+            read_stats,
+            granularity,
+            since=since,
+            until=until,
+            base_currency=base_currency,
+            quote_currency=quote_currency,
+            max_buckets=max(min(max_buckets, 10000), 0),
         )
     except SQLAlchemyError as exc:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="database error") from exc
-    return HistoryResponse( conversions=conversions)
+    pair_stats = [
+        PairStats(
+            base_currency=pair.base_currency,
+            quote_currency=pair.quote_currency,
+            count=pair.count,
+            amount_sum=pair.amount_sum,
+            converted_sum=pair.converted_sum,
+        )
+        for pair in pairs
+    ]
+    return StatsResponse(
+        granularity=granularity,
+        total_count=sum(pair.count for pair in pair_stats),
+        pairs=pair_stats,
+        buckets=[StatsBucket.model_validate(bucket) for bucket in buckets],
+    )
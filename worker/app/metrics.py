@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+_FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    "worker_stage_seconds",
+    "Время этапов обработки запроса",
+    ["endpoint", "stage"],
+    buckets=_FAST_BUCKETS,
+)
+DETECTED_MENTIONS = Histogram(
+    "worker_detected_mentions",
+    "Число найденных упоминаний валют в одном тексте",
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500),
+)
+RATES_CACHE_LOOKUPS = Counter(
+    "worker_rates_cache_lookups_total",
+    "Обращения к кэшу курсов: hit - свежий снимок, stale - устаревший с фоновым обновлением, miss - ожидание обновления",
+    ["result"],
+)
+RATES_REFRESHES = Counter(
+    "worker_rates_refreshes_total",
+    "Попытки обновить снимок курсов",
+    ["outcome"],
+)
+RATES_FETCH_SECONDS = Histogram(
+    "worker_rates_fetch_seconds",
+    "Время запроса к поставщику курсов",
+    buckets=_FAST_BUCKETS,
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "worker_db_pool_checkout_seconds",
+    "Ожидание соединения из пула БД",
+    ["engine"],
+    buckets=_FAST_BUCKETS,
+)
+DETECTION_CACHE_LOOKUPS = Counter(
+    "worker_detection_cache_lookups_total",
+    "Обращения к кэшу распознавания",
+    ["cache", "result"],
+)
+DETECTION_STREAM_FORCED_CUTS = Counter(
+    "worker_detection_stream_forced_cuts_total",
+    "Разрезы потокового текста без безопасной границы: упоминание на разрезе могло разделиться",
+)
+CONVERSION_LOG_FLUSH_SECONDS = Histogram(
+    "worker_conversion_log_flush_seconds",
+    "Запись одной пачки конвертаций в БД",
+    buckets=_FAST_BUCKETS,
+)
+
+
+def observe_stage(endpoint: str, stage: str, started: float) -> float:
+    """Записывает длительность этапа с момента started и возвращает текущее время для следующего этапа."""
+    now = time.perf_counter()
+    STAGE_SECONDS.labels(endpoint, stage).observe(now - started)
+    return now
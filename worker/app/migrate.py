@@ -0,0 +1,104 @@
+"""Приведение схемы существующей базы к моделям.
+
+Добавляет в таблицы новые nullable-колонки и недостающие индексы. Запускается
+один раз перед выкладкой, а не при старте каждого процесса воркера: одновременные
+ALTER TABLE из нескольких процессов мешают друг другу, и проигравший не стартует.
+На PostgreSQL индексы строятся через CREATE INDEX CONCURRENTLY, не блокируя
+запись в таблицу; индекс, оставшийся невалидным после прерванной сборки,
+пересоздаётся.
+
+    python -m app.migrate
+"""
+from __future__ import annotations
+
+import logging
+import re
+import time
+
+from sqlalchemy import Index, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from . import models  # noqa: F401  регистрирует таблицы в Base.metadata
+from .db import Base, engine, init_db
+
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns() -> int:
+    """Добавляет nullable-колонки, которых нет в таблицах; возвращает их число."""
+    postgres = engine.dialect.name == "postgresql"
+    inspector = inspect(engine)
+    added = 0
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                if_not_exists = "IF NOT EXISTS " if postgres else ""
+                connection.execute(
+                    text(f"ALTER TABLE {table.name} ADD COLUMN {if_not_exists}{column.name} {column_type}")
+                )
+                logger.info("Added column %s.%s", table.name, column.name)
+                added += 1
+    return added
+
+
+def _concurrent_create_sql(index: Index) -> str:
+    sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    return re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX CONCURRENTLY ", sql)
+
+
+def create_missing_indexes() -> int:
+    """Создаёт индексы моделей, которых ещё нет в базе; возвращает их число."""
+    if engine.dialect.name != "postgresql":
+        inspector = inspect(engine)
+        created = 0
+        with engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                existing = {index["name"] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name in existing:
+                        continue
+                    index.create(connection)
+                    logger.info("Created index %s", index.name)
+                    created += 1
+        return created
+
+    # CONCURRENTLY не работает внутри транзакции.
+    created = 0
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        rows = connection.execute(
+            text(
+                "SELECT c.relname, i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = current_schema()"
+            )
+        )
+        valid = dict(rows.all())
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if valid.get(index.name):
+                    continue
+                if index.name in valid:
+                    logger.warning("Index %s is invalid after an interrupted build, rebuilding", index.name)
+                    connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+                started = time.perf_counter()
+                connection.execute(text(_concurrent_create_sql(index)))
+                logger.info("Created index %s in %.1f s", index.name, time.perf_counter() - started)
+                created += 1
+    return created
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    added = add_missing_columns()
+    created = create_missing_indexes()
+    logger.info("Schema is up to date: %d columns added, %d indexes created", added, created)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, DateTime, Float, Integer, String, Text, func
+from datetime import datetime, timezone
+
+from sqlalchemy import JSON, Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
 
 from .db import Base
 
 class CurrencyConversion(Base):
     __tablename__ = "currency_conversions"
+    __table_args__ = (
+        Index("ix_currency_conversions_created_at_id", "created_at", "id"),
+        Index("ix_currency_conversions_pair_created_at", "base_currency", "quote_currency", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False)
@@ -11,4 +17,46 @@ class CurrencyConversion(Base):
     quote_currency = Column(String(8), nullable=False)
     rate = Column(Float, nullable=False)
     converted_amount = Column(Float, nullable=False)
+    rate_snapshot_id = Column(Integer, ForeignKey("rate_snapshots.id"), nullable=True, index=True)
+    rate_date = Column(Date, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+class RateSnapshot(Base):
+    __tablename__ = "rate_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reference_currency = Column(String(8), nullable=False)
+    rates = Column(JSON, nullable=False)
+    rates_hash = Column(String(64), nullable=False, unique=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    checked_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class DailyRate(Base):
+    __tablename__ = "rate_history"
+    __table_args__ = (UniqueConstraint("reference_currency", "rate_date"),)
+
+    id = Column(Integer, primary_key=True)
+    reference_currency = Column(String(8), nullable=False)
+    rate_date = Column(Date, nullable=False, index=True)
+    rates = Column(JSON, nullable=False)
+
+
+class ConversionRollup(Base):
+    __tablename__ = "conversion_rollups"
+    __table_args__ = (UniqueConstraint("granularity", "bucket_start", "base_currency", "quote_currency"),)
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(8), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    base_currency = Column(String(8), nullable=False)
+    quote_currency = Column(String(8), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    amount_sum = Column(Float, nullable=False, default=0.0)
+    converted_sum = Column(Float, nullable=False, default=0.0)
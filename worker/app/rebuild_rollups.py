@@ -0,0 +1,32 @@
+"""Пересчёт агрегатов /stats по всей истории конвертаций.
+
+Нужен один раз после включения агрегатов на базе с уже накопленной историей,
+дальше агрегаты обновляются при каждой записи конвертаций.
+
+    python -m app.rebuild_rollups
+"""
+from __future__ import annotations
+
+import logging
+
+from .db import SessionLocal, init_db
+from .services.rollups import rebuild_rollups
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    session = SessionLocal()
+    try:
+        total = rebuild_rollups(session)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    logging.getLogger(__name__).info("Rebuilt rollups from %d conversions", total)
+
+
+if __name__ == "__main__":
+    main()
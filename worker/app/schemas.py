@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import List
+from datetime import date, datetime
+from typing import Dict, List, Literal, Tuple
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -7,6 +7,7 @@ class ConversionRequest(BaseModel):
     amount: float = Field(..., gt=0)  
     base_currency: str = Field(..., min_length=3, max_length=4)
     quote_currency: str = Field(..., min_length=3, max_length=4)
+    as_of: date | None = None
 class ConversionResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -16,12 +17,46 @@ class ConversionResponse(BaseModel):
     quote_currency: str
     rate: float
     converted_amount: float
+    rate_snapshot_id: int | None = None
+    rate_date: date | None = None
     created_at: datetime
 
 
+class RatesResponse(BaseModel):
+    version: str
+    snapshot_id: int | None
+    rates: Dict[str, Dict[str, float]]
+
+
+class HistoricalConversionItem(BaseModel):
+    amount: float = Field(..., gt=0)
+    base_currency: str = Field(..., min_length=3, max_length=4)
+    quote_currency: str = Field(..., min_length=3, max_length=4)
+    as_of: date
+
+
+class HistoricalConversionRequest(BaseModel):
+    items: List[HistoricalConversionItem] = Field(..., min_length=1, max_length=10000)
+
+
+class HistoricalConversionResult(BaseModel):
+    amount: float
+    base_currency: str
+    quote_currency: str
+    as_of: date
+    rate_date: date | None
+    rate: float | None
+    converted_amount: float | None
+
+
+class HistoricalConversionResponse(BaseModel):
+    results: List[HistoricalConversionResult]
+
+
 class HistoryResponse(BaseModel):
     
     conversions: List[ConversionResponse]
+    next_cursor: str | None = None
 
 
 class CurrencyDetectionRequest(BaseModel):
@@ -46,3 +81,52 @@ class DetectedCurrency(BaseModel):
 
 class CurrencyDetectionResponse(BaseModel):
     items: List[DetectedCurrency]
+
+
+class CurrencyDetectionBatchRequest(BaseModel):
+    items: List[CurrencyDetectionRequest] = Field(..., min_length=1, max_length=1000)
+
+
+class CurrencyDetectionBatchResponse(BaseModel):
+    results: List[CurrencyDetectionResponse]
+
+
+class BulkExtractionRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=10000)
+
+
+class BulkExtractionResponse(BaseModel):
+    text_index: List[int]
+    start: List[int]
+    end: List[int]
+    amount: List[float]
+    currency: List[str]
+
+
+class AliasDictionaryResponse(BaseModel):
+    version: int
+    aliases: Dict[str, List[str]]
+    symbols: Dict[str, str]
+    suffixes: List[str]
+    multipliers: List[Tuple[str, float]]
+
+
+class PairStats(BaseModel):
+    base_currency: str
+    quote_currency: str
+    count: int
+    amount_sum: float
+    converted_sum: float
+
+
+class StatsBucket(PairStats):
+    model_config = ConfigDict(from_attributes=True)
+
+    bucket_start: datetime
+
+
+class StatsResponse(BaseModel):
+    granularity: Literal["minute", "hour", "day"]
+    total_count: int
+    pairs: List[PairStats]
+    buckets: List[StatsBucket]
@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import csv
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timezone
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import time
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Sequence
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from .. import models
+from ..config import get_settings
+from ..db import SessionLocal
+from .bulk_extraction import BulkExtractor
+from .currency import CurrencyServiceError, convert_many, get_rate_table
+from .rate_history import convert_historical
+from .rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_MESSAGES_KEY = re.compile(r'"messages"\s*:\s*\[')
+_DECODER = json.JSONDecoder()
+_READ_SIZE = 1 << 20
+
+DB_COLUMNS = (
+    "amount",
+    "base_currency",
+    "quote_currency",
+    "rate",
+    "converted_amount",
+    "rate_snapshot_id",
+    "rate_date",
+    "created_at",
+)
+FILE_COLUMNS = ("message_id", "match_text", "start", "end") + DB_COLUMNS
+
+
+class ArchiveMessage(NamedTuple):
+    position: int
+    message_id: int | None
+    sent_at: datetime
+    text: str
+
+
+def iter_archive_elements(path: str | Path) -> Iterator[Dict[str, Any]]:
+    """Элементы всех массивов "messages" экспорта Telegram по одному, без чтения файла целиком.
+
+    Подходит и для result.json одного чата, и для экспорта всего аккаунта
+    (chats.list[].messages). Внутри строк JSON кавычки экранированы, поэтому
+    ключ "messages" находится поиском по тексту между массивами.
+    """
+    with Path(path).open(encoding="utf-8") as source:
+        buffer = ""
+        pos = 0
+        eof = False
+        in_array = False
+        while True:
+            if not in_array:
+                match = _MESSAGES_KEY.search(buffer, pos)
+                if match is not None:
+                    in_array, pos = True, match.end()
+                    continue
+                if eof:
+                    return
+                # Ключ может оказаться на стыке кусков, поэтому хвост остаётся в буфере.
+                pos = max(pos, len(buffer) - 64)
+            else:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buffer):
+                    if buffer[pos] == "]":
+                        in_array = False
+                        pos += 1
+                        continue
+                    try:
+                        element, pos = _DECODER.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    else:
+                        yield element
+                        continue
+                elif eof:
+                    raise ValueError("unexpected end of archive inside a messages array")
+            chunk = source.read(_READ_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Текст сообщения: в экспорте это строка или список строк и фрагментов с разметкой."""
+    text = message.get("text", "")
+    if isinstance(text, str):
+        return text
+    return "".join(part if isinstance(part, str) else str(part.get("text", "")) for part in text)
+
+
+def _sent_at(message: Dict[str, Any]) -> datetime:
+    unixtime = message.get("date_unixtime")
+    if unixtime is not None:
+        return datetime.fromtimestamp(int(unixtime), tz=timezone.utc)
+    sent_at = datetime.fromisoformat(message["date"])
+    return sent_at if sent_at.tzinfo else sent_at.replace(tzinfo=timezone.utc)
+
+
+def iter_archive_messages(path: str | Path, skip: int = 0) -> Iterator[ArchiveMessage]:
+    """Текстовые сообщения архива; служебные и пустые пропускаются, skip первых элементов не разбираются."""
+    elements = itertools.islice(iter_archive_elements(path), skip, None)
+    for position, element in enumerate(elements, skip):
+        if element.get("type", "message") != "message":
+            continue
+        text = message_text(element)
+        if not text.strip():
+            continue
+        try:
+            sent_at = _sent_at(element)
+        except (KeyError, TypeError, ValueError):
+            logger.warning("Skipping message %s without a valid date", element.get("id"))
+            continue
+        yield ArchiveMessage(position, element.get("id"), sent_at, text)
+
+
+def iter_batches(messages: Iterable[ArchiveMessage], size: int) -> Iterator[List[ArchiveMessage]]:
+    iterator = iter(messages)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def target_currencies() -> List[str]:
+    targets: List[str] = []
+    for code in (settings.primary_quote_currency, settings.secondary_quote_currency, *settings.additional_quote_currencies):
+        if code and code.upper() not in targets:
+            targets.append(code.upper())
+    return targets
+
+
+@dataclass
+class ImportStats:
+    position: int = 0
+    messages: int = 0
+    mentions: int = 0
+    rows: int = 0
+    historical_rows: int = 0
+    unconverted: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, int | float]:
+        return asdict(self)
+
+
+def convert_batch(
+    batch: Sequence[ArchiveMessage],
+    extractor: BulkExtractor,
+    targets: Sequence[str],
+    stats: ImportStats,
+    historical_only: bool = False,
+) -> List[Dict[str, Any]]:
+    """Упоминания пачки сообщений с конвертацией по курсам на дату сообщения.
+
+    Если истории на дату нет, берётся текущий снимок курсов (кроме historical_only);
+    пары без курса не попадают в результат и считаются в stats.unconverted.
+    """
+    columns = extractor.extract_columns([message.text for message in batch])
+    stats.mentions += len(columns)
+    owners: List[int] = []
+    amounts: List[float] = []
+    bases: List[str] = []
+    quotes: List[str] = []
+    dates: List[date] = []
+    for position, (index, base) in enumerate(zip(columns.text_index, columns.currency)):
+        for quote in targets:
+            if quote == base:
+                continue
+            owners.append(position)
+            amounts.append(columns.amount[position])
+            bases.append(base)
+            quotes.append(quote)
+            dates.append(batch[index].sent_at.date())
+    if not owners:
+        return []
+
+    rate_dates, rates, converted = convert_historical(amounts, bases, quotes, dates)
+    snapshot_ids: List[int | None] = [None] * len(owners)
+    missing = np.flatnonzero(np.isnan(rates))
+    if len(missing) and not historical_only:
+        try:
+            table = get_rate_table()
+        except CurrencyServiceError:
+            logger.warning("Current rates are unavailable, %d conversions without history are skipped", len(missing))
+        else:
+            rates[missing], converted[missing] = convert_many(
+                [amounts[i] for i in missing], [bases[i] for i in missing], [quotes[i] for i in missing], table
+            )
+            for i in missing.tolist():
+                rate_dates[i] = None
+                snapshot_ids[i] = table.snapshot_id
+
+    rows: List[Dict[str, Any]] = []
+    rates_list = rates.tolist()
+    converted_list = converted.tolist()
+    for i, position in enumerate(owners):
+        rate = rates_list[i]
+        if rate != rate:
+            stats.unconverted += 1
+            continue
+        message = batch[columns.text_index[position]]
+        start, end = columns.start[position], columns.end[position]
+        rows.append(
+            {
+                "message_id": message.message_id,
+                "match_text": message.text[start:end],
+                "start": start,
+                "end": end,
+                "amount": amounts[i],
+                "base_currency": bases[i],
+                "quote_currency": quotes[i],
+                "rate": rate,
+                "converted_amount": converted_list[i],
+                "rate_snapshot_id": snapshot_ids[i],
+                "rate_date": rate_dates[i],
+                "created_at": message.sent_at,
+            }
+        )
+        if rate_dates[i] is not None:
+            stats.historical_rows += 1
+    return rows
+
+
+class DatabaseSink:
+    """Запись в currency_conversions и роллапы одной транзакцией на пачку; created_at - время сообщения."""
+
+    def write(self, first_position: int, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        batch = [{column: row[column] for column in DB_COLUMNS} for row in rows]
+        session = SessionLocal()
+        try:
+            session.execute(insert(models.CurrencyConversion), batch)
+            apply_rollups(session, batch)
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def state(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class CsvSink:
+    """CSV с дозаписью; при возобновлении файл обрезается до размера из контрольной точки."""
+
+    def __init__(self, path: Path, state: Dict[str, Any] | None = None) -> None:
+        self.path = path
+        offset = (state or {}).get("offset", 0)
+        self._file = path.open("a+", encoding="utf-8", newline="")
+        self._file.truncate(offset)
+        self._file.seek(offset)
+        self._writer = csv.writer(self._file)
+        if not offset:
+            self._writer.writerow(FILE_COLUMNS)
+
+    def write(self, first_position: int, rows: List[Dict[str, Any]]) -> None:
+        self._writer.writerows([row[column] for column in FILE_COLUMNS] for row in rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def state(self) -> Dict[str, Any]:
+        return {"offset": self._file.tell()}
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetSink:
+    """Каталог Parquet-файлов, по файлу на пачку; имя - позиция первого сообщения, так что повтор пачки его перезаписывает."""
+
+    def __init__(self, directory: Path) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow") from exc
+        self._pa = pa
+        self._pq = pq
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, first_position: int, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        table = self._pa.Table.from_pylist([{column: row[column] for column in FILE_COLUMNS} for row in rows])
+        target = self.directory / f"part-{first_position:012d}.parquet"
+        temporary = target.with_suffix(".tmp")
+        self._pq.write_table(table, temporary)
+        os.replace(temporary, target)
+
+    def state(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+@dataclass
+class Checkpoint:
+    """Контрольная точка импорта: позиция в архиве, счётчики и состояние приёмника.
+
+    Сохраняется после того, как пачка записана, через временный файл и os.replace.
+    Для БД между commit и сохранением точки остаётся окно: при падении в нём
+    последняя пачка будет записана повторно.
+    """
+
+    path: Path
+    archive: Dict[str, Any]
+    stats: ImportStats = field(default_factory=ImportStats)
+    sink: Dict[str, Any] = field(default_factory=dict)
+
+    @staticmethod
+    def identify(archive: Path) -> Dict[str, Any]:
+        status = archive.stat()
+        return {"path": str(archive.resolve()), "size": status.st_size, "mtime_ns": status.st_mtime_ns}
+
+    @classmethod
+    def load(cls, path: Path, archive: Path) -> "Checkpoint":
+        identity = cls.identify(archive)
+        if not path.exists():
+            return cls(path, identity)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("archive") != identity:
+            raise ValueError(f"checkpoint {path} belongs to another archive or the archive has changed")
+        return cls(path, identity, ImportStats(**data["stats"]), data.get("sink", {}))
+
+    def save(self) -> None:
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        payload = {
+            "archive": self.archive,
+            "stats": self.stats.as_dict(),
+            "sink": self.sink,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        temporary.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+
+def run_import(
+    checkpoint: Checkpoint,
+    sink: DatabaseSink | CsvSink | ParquetSink,
+    extractor: BulkExtractor,
+    batch_size: int = 5000,
+    historical_only: bool = False,
+    progress_interval: float = 10.0,
+) -> ImportStats:
+    """Конвейер: чтение архива -> пачки -> распознавание и конвертация -> запись -> контрольная точка."""
+    stats = checkpoint.stats
+    targets = target_currencies()
+    archive = Path(checkpoint.archive["path"])
+    resumed_from = stats.position
+    started = time.perf_counter()
+    elapsed_before = stats.seconds
+    last_report = started
+    for batch in iter_batches(iter_archive_messages(archive, skip=stats.position), batch_size):
+        rows = convert_batch(batch, extractor, targets, stats, historical_only)
+        sink.write(batch[0].position, rows)
+        stats.messages += len(batch)
+        stats.rows += len(rows)
+        stats.position = batch[-1].position + 1
+        stats.seconds = elapsed_before + time.perf_counter() - started
+        checkpoint.sink = sink.state()
+        checkpoint.save()
+        now = time.perf_counter()
+        if now - last_report >= progress_interval:
+            last_report = now
+            logger.info(
+                "Position %d: %d messages, %d mentions, %d rows (%.0f elements/s)",
+                stats.position,
+                stats.messages,
+                stats.mentions,
+                stats.rows,
+                (stats.position - resumed_from) / (now - started),
+            )
+    return stats
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from array import array
+import asyncio
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import itertools
+import multiprocessing
+import os
+import threading
+from typing import Deque, Iterable, Iterator, List, Sequence, Tuple
+
+from .currency_extractor import AliasDictionary, CurrencyMention, extract_currency_mentions, get_dictionary
+
+Shard = Tuple[int, List[str]]
+
+_worker_dictionary: AliasDictionary | None = None
+
+
+class MentionColumns:
+    """Упоминания пачки текстов по столбцам: индекс текста, start, end, сумма, код валюты.
+
+    Массивы array уходят между процессами одним блоком байт, коды валют - общие
+    строки словаря, а match_text не передаётся вовсе: это text[start:end].
+    """
+
+    __slots__ = ("text_index", "start", "end", "amount", "currency")
+
+    def __init__(self) -> None:
+        self.text_index = array("q")
+        self.start = array("i")
+        self.end = array("i")
+        self.amount = array("d")
+        self.currency: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.currency)
+
+    def append(self, text_index: int, mention: CurrencyMention) -> None:
+        self.text_index.append(text_index)
+        self.start.append(mention.start)
+        self.end.append(mention.end)
+        self.amount.append(mention.amount)
+        self.currency.append(mention.currency)
+
+    def extend(self, other: MentionColumns) -> None:
+        self.text_index.extend(other.text_index)
+        self.start.extend(other.start)
+        self.end.extend(other.end)
+        self.amount.extend(other.amount)
+        self.currency.extend(other.currency)
+
+    def rows(self, texts: Sequence[str], offset: int = 0) -> Iterator[Tuple[int, CurrencyMention]]:
+        """Пары (индекс текста, упоминание); texts - тексты начиная с индекса offset."""
+        for index, start, end, amount, currency in zip(
+            self.text_index, self.start, self.end, self.amount, self.currency
+        ):
+            yield index, CurrencyMention(amount, currency, texts[index - offset][start:end], start, end)
+
+
+def _init_worker(dictionary: AliasDictionary) -> None:
+    global _worker_dictionary
+    _worker_dictionary = dictionary
+
+
+def _extract_shard(shard: Shard) -> MentionColumns:
+    offset, texts = shard
+    dictionary = _worker_dictionary or get_dictionary()
+    columns = MentionColumns()
+    for index, text in enumerate(texts, offset):
+        for mention in extract_currency_mentions(text, dictionary):
+            columns.append(index, mention)
+    return columns
+
+
+def _shards(texts: Iterable[str], chunk_size: int) -> Iterator[Shard]:
+    iterator = iter(texts)
+    offset = 0
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield offset, chunk
+        offset += len(chunk)
+
+
+class BulkExtractor:
+    """Распознавание больших массивов текстов в пуле процессов.
+
+    Тексты режутся на пачки по chunk_size и раздаются процессам; назад приходят
+    MentionColumns. Процессы стартуют через spawn (родитель многопоточный) и
+    получают текущий словарь алиасов; после перезагрузки словаря пул пересоздаётся.
+    При workers <= 1 пачки разбираются в текущем процессе.
+    """
+
+    def __init__(self, workers: int | None = None, chunk_size: int = 500) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(chunk_size, 1)
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_version: int | None = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        dictionary = get_dictionary()
+        with self._lock:
+            if self._pool is None or self._pool_version != dictionary.version:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(dictionary,),
+                )
+                self._pool_version = dictionary.version
+            return self._pool
+
+    def iter_columns(self, texts: Iterable[str]) -> Iterator[MentionColumns]:
+        """Результаты пачек по порядку; в работе не больше двух пачек на процесс, так что texts может быть генератором."""
+        if self.workers <= 1:
+            for shard in _shards(texts, self.chunk_size):
+                yield _extract_shard(shard)
+            return
+        pool = self._get_pool()
+        pending: Deque[Future[MentionColumns]] = deque()
+        for shard in _shards(texts, self.chunk_size):
+            pending.append(pool.submit(_extract_shard, shard))
+            if len(pending) >= self.workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def extract_columns(self, texts: Iterable[str]) -> MentionColumns:
+        columns = MentionColumns()
+        for part in self.iter_columns(texts):
+            columns.extend(part)
+        return columns
+
+    async def extract_columns_async(self, texts: Sequence[str]) -> MentionColumns:
+        if self.workers <= 1:
+            return await asyncio.to_thread(self.extract_columns, texts)
+        pool = self._get_pool()
+        loop = asyncio.get_running_loop()
+        parts = await asyncio.gather(
+            *(loop.run_in_executor(pool, _extract_shard, shard) for shard in _shards(texts, self.chunk_size))
+        )
+        columns = MentionColumns()
+        for part in parts:
+            columns.extend(part)
+        return columns
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from .. import models
+from ..config import get_settings
+from ..db import SessionLocal
+from ..metrics import CONVERSION_LOG_FLUSH_SECONDS
+from .rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ConversionLog:
+    """Очередь записи конвертаций в БД: строки пишутся фоновым потоком пачками.
+
+    Пачка уходит в базу одним многострочным INSERT, когда набралось batch_size
+    строк или прошло flush_interval секунд с первой строки. При переполнении
+    очереди submit ждёт до put_timeout секунд, после чего строка отбрасывается.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float, put_timeout: float) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue: queue.Queue[Dict[str, Any]] = queue.Queue(maxsize=max_size)
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="conversion-log", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Дописывает всё, что осталось в очереди, и останавливает поток."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def submit(self, rows: Iterable[Dict[str, Any]]) -> int:
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        accepted = dropped = 0
+        for row in rows:
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+            except queue.Full:
+                dropped += 1
+            else:
+                accepted += 1
+        with self._lock:
+            self.enqueued += accepted
+            self.dropped += dropped
+        if dropped:
+            logger.warning("Conversion log queue is full, dropped %d rows", dropped)
+        return accepted
+
+    async def submit_async(self, rows: List[Dict[str, Any]]) -> int:
+        """submit для event loop: ожидание места в очереди уходит в поток."""
+        if not self._queue.maxsize or self._queue.maxsize - self._queue.qsize() >= len(rows):
+            return self.submit(rows)
+        return await asyncio.to_thread(self.submit, rows)
+
+    def flush(self) -> None:
+        """Блокирует до записи всех принятых строк."""
+        self._queue.join()
+
+    def stats(self) -> Dict[str, int | float]:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "capacity": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+                "batches": self.batches,
+                "last_flush_seconds": self.last_flush_seconds,
+            }
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if self._stopping.is_set() or remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        session = SessionLocal()
+        try:
+            session.execute(insert(models.CurrencyConversion), batch)
+            apply_rollups(session, batch)
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            logger.exception("Failed to write %d conversions", len(batch))
+            with self._lock:
+                self.failed += len(batch)
+        else:
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+        finally:
+            session.close()
+            self.last_flush_seconds = time.perf_counter() - started
+            CONVERSION_LOG_FLUSH_SECONDS.observe(self.last_flush_seconds)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self._stopping.is_set():
+                return
+
+
+conversion_log = ConversionLog(
+    max_size=settings.conversion_log_queue_size,
+    batch_size=settings.conversion_log_batch_size,
+    flush_interval=settings.conversion_log_flush_interval,
+    put_timeout=settings.conversion_log_put_timeout,
+)
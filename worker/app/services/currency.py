@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import threading
 import time
-from typing import Any, Dict, Tuple
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Sequence, Tuple
 
+import httpx
+import numpy as np
 import requests
 
 from ..config import get_settings
+from ..metrics import RATES_CACHE_LOOKUPS, RATES_FETCH_SECONDS, RATES_REFRESHES
+from .rate_store import load_latest_snapshot, rates_hash, save_snapshot
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
@@ -14,27 +23,288 @@ class CurrencyServiceError(Exception):
     pass
 
 
-_reference_rates_cache: tuple[float, Dict[str, float]] | None = None
+# Знаков после запятой в сконвертированной сумме.
+AMOUNT_DIGITS = 4
 
 
-def _get_reference_rates() -> Dict[str, float]:
-    global _reference_rates_cache
-    now = time.time()
-    cached = _reference_rates_cache
-    if cached and now - cached[0] <= settings.currency_cache_ttl:
-        return cached[1]
+def _round_amounts(values: np.ndarray) -> np.ndarray:
+    """Поэлементный round(): np.round иногда расходится с ним в последнем знаке."""
+    return np.fromiter((round(value, AMOUNT_DIGITS) for value in values.tolist()), dtype=float, count=len(values))
+
+
+class RateTable:
+    """Неизменяемая матрица кросс-курсов одного снимка: matrix[base, quote].
+
+    version - хеш набора курсов: меняется вместе с курсами, даже если снимок
+    не удалось сохранить в БД и snapshot_id пуст.
+    """
+
+    __slots__ = ("rates", "codes", "index", "matrix", "snapshot_id", "version")
+
+    def __init__(self, rates: Dict[str, float], reference: str, snapshot_id: int | None = None) -> None:
+        codes = tuple(sorted(set(rates) | {reference}))
+        vector = np.array([1.0 if code == reference else float(rates[code]) for code in codes])
+        matrix = vector[np.newaxis, :] / vector[:, np.newaxis]
+        matrix.setflags(write=False)
+        self.rates: Mapping[str, float] = MappingProxyType(dict(rates))
+        self.codes = codes
+        self.index: Mapping[str, int] = MappingProxyType({code: i for i, code in enumerate(codes)})
+        self.matrix = matrix
+        self.snapshot_id = snapshot_id
+        self.version = rates_hash(reference, self.rates)[:16]
+
+    def rate(self, base: str, quote: str) -> float:
+        base_index = self.index.get(base)
+        quote_index = self.index.get(quote)
+        if base_index is None or quote_index is None:
+            raise CurrencyServiceError("currency pair is not supported")
+        return float(self.matrix[base_index, quote_index])
+
+    def indices(self, codes: Sequence[str]) -> np.ndarray:
+        """Индексы валют в матрице; для неизвестных кодов -1."""
+        unique, inverse = np.unique(np.asarray(codes, dtype=str), return_inverse=True)
+        lookup = np.array([self.index.get(code, -1) for code in unique.tolist()], dtype=np.intp)
+        return lookup[inverse]
+
+    def convert(
+        self, amounts: np.ndarray, base_indices: np.ndarray, quote_indices: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Курсы и округлённые суммы для массивов индексов; для индексов -1 результат NaN."""
+        valid = (base_indices >= 0) & (quote_indices >= 0)
+        rates = np.where(valid, self.matrix[base_indices, quote_indices], np.nan)
+        return rates, _round_amounts(amounts * rates)
+
+
+_reference_rates_cache: tuple[float, RateTable] | None = None
+_last_refresh_failure: float = 0.0
+_refresh_attempts = 0
+_warm_started = False
+_refresh_lock = threading.Lock()
+_async_client: httpx.AsyncClient | None = None
+_async_refresh: asyncio.Future[RateTable] | None = None
+
+
+def _shared_table(reference: str) -> tuple[float, RateTable] | None:
+    """Свежий снимок, уже сохранённый в БД другим процессом."""
+    shared = load_latest_snapshot(reference)
+    if shared is not None and time.time() - shared.checked_at <= settings.currency_cache_ttl:
+        return shared.checked_at, RateTable(shared.rates, reference, shared.id)
+    return None
+
+
+def _fetch_rate_table() -> tuple[float, RateTable]:
+    reference = settings.reference_currency.upper()
+    shared = _shared_table(reference)
+    if shared is not None:
+        return shared
 
     try:
-        response = requests.get(settings.currency_rates_url, timeout=settings.request_timeout)
+        with RATES_FETCH_SECONDS.time():
+            response = requests.get(settings.currency_rates_url, timeout=settings.request_timeout)
         response.raise_for_status()
     except requests.RequestException as exc:
         raise CurrencyServiceError("failed to fetch conversion rates") from exc
 
-    payload = response.json()
+    try:
+        payload = response.json()
+    except ValueError as exc:
+        raise CurrencyServiceError("invalid data from currency provider") from exc
     rates = _parse_rates(payload)
+    return time.time(), RateTable(rates, reference, save_snapshot(reference, rates))
 
-    _reference_rates_cache = (now, rates)
-    return rates
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=settings.request_timeout,
+            limits=httpx.Limits(
+                max_connections=settings.rates_http_max_connections,
+                max_keepalive_connections=settings.rates_http_max_connections,
+            ),
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
+
+
+async def _fetch_rate_table_async() -> tuple[float, RateTable]:
+    reference = settings.reference_currency.upper()
+    shared = await asyncio.to_thread(_shared_table, reference)
+    if shared is not None:
+        return shared
+
+    try:
+        with RATES_FETCH_SECONDS.time():
+            response = await _get_async_client().get(settings.currency_rates_url)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise CurrencyServiceError("failed to fetch conversion rates") from exc
+
+    try:
+        payload = response.json()
+    except ValueError as exc:
+        raise CurrencyServiceError("invalid data from currency provider") from exc
+    rates = _parse_rates(payload)
+    return time.time(), RateTable(rates, reference, await asyncio.to_thread(save_snapshot, reference, rates))
+
+
+def _refresh_locked() -> RateTable:
+    global _reference_rates_cache, _last_refresh_failure, _refresh_attempts
+    try:
+        fetched_at, table = _fetch_rate_table()
+    except CurrencyServiceError:
+        _last_refresh_failure = time.time()
+        RATES_REFRESHES.labels("error").inc()
+        raise
+    else:
+        _reference_rates_cache = (fetched_at, table)
+        RATES_REFRESHES.labels("ok").inc()
+    finally:
+        _refresh_attempts += 1
+    return table
+
+
+def _warm_start() -> tuple[float, RateTable] | None:
+    """Поднимает кэш из последнего сохранённого снимка, не обращаясь к провайдеру."""
+    global _reference_rates_cache, _warm_started
+    with _refresh_lock:
+        if _reference_rates_cache is None and not _warm_started:
+            _warm_started = True
+            reference = settings.reference_currency.upper()
+            snapshot = load_latest_snapshot(reference)
+            if snapshot is not None:
+                _reference_rates_cache = (snapshot.checked_at, RateTable(snapshot.rates, reference, snapshot.id))
+        return _reference_rates_cache
+
+
+def _refresh_in_background() -> None:
+    if not _refresh_lock.acquire(blocking=False):
+        return
+
+    def _run() -> None:
+        try:
+            _refresh_locked()
+        except CurrencyServiceError:
+            logger.warning("Background rates refresh failed", exc_info=True)
+        finally:
+            _refresh_lock.release()
+
+    threading.Thread(target=_run, name="rates-refresh", daemon=True).start()
+
+
+def _refresh_blocking() -> RateTable:
+    attempts = _refresh_attempts
+    with _refresh_lock:
+        if _refresh_attempts != attempts:
+            cached = _reference_rates_cache
+            if cached is None:
+                raise CurrencyServiceError("failed to fetch conversion rates")
+            return cached[1]
+        return _refresh_locked()
+
+
+async def _refresh_task() -> RateTable:
+    global _reference_rates_cache, _last_refresh_failure, _refresh_attempts
+    try:
+        fetched_at, table = await _fetch_rate_table_async()
+    except CurrencyServiceError:
+        _last_refresh_failure = time.time()
+        RATES_REFRESHES.labels("error").inc()
+        raise
+    else:
+        _reference_rates_cache = (fetched_at, table)
+        RATES_REFRESHES.labels("ok").inc()
+    finally:
+        _refresh_attempts += 1
+    return table
+
+
+def _async_refresh_future() -> asyncio.Future[RateTable]:
+    """Текущая загрузка из event loop; новая начинается, только если предыдущая завершилась."""
+    global _async_refresh
+    if _async_refresh is None or _async_refresh.done():
+        _async_refresh = asyncio.ensure_future(_refresh_task())
+    return _async_refresh
+
+
+async def _refresh_async() -> RateTable:
+    """Обновление из event loop: одновременные запросы ждут одну и ту же загрузку."""
+    return await asyncio.shield(_async_refresh_future())
+
+
+def _log_background_failure(future: asyncio.Future[RateTable]) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Background rates refresh failed: %s", future.exception())
+
+
+def _refresh_async_in_background() -> None:
+    # Та же загрузка, что и у _refresh_async, так что устаревший и истёкший кэш
+    # не запускают два запроса к провайдеру.
+    if _async_refresh is None or _async_refresh.done():
+        _async_refresh_future().add_done_callback(_log_background_failure)
+
+
+def _cached_table(cached: tuple[float, RateTable], revalidate: Callable[[], None]) -> RateTable | None:
+    """Снимок, который можно отдать без ожидания провайдера; устаревший обновляется в фоне через revalidate."""
+    now = time.time()
+    fetched_at, table = cached
+    age = now - fetched_at
+    if age <= settings.currency_cache_ttl:
+        RATES_CACHE_LOOKUPS.labels("hit").inc()
+        return table
+    if age <= settings.currency_cache_hard_ttl or now - _last_refresh_failure <= settings.currency_retry_interval:
+        RATES_CACHE_LOOKUPS.labels("stale").inc()
+        revalidate()
+        return table
+    RATES_CACHE_LOOKUPS.labels("miss").inc()
+    return None
+
+
+def _get_reference_rates() -> RateTable:
+    """Снимок курсов по схеме stale-while-revalidate с одним запросом к провайдеру.
+
+    До currency_cache_ttl снимок свежий; до currency_cache_hard_ttl он отдаётся
+    сразу, а обновление идёт в фоне; дальше запрос ждёт обновления, но при
+    недоступном провайдере получает последний удачный снимок.
+    """
+    cached = _reference_rates_cache or _warm_start()
+    if cached is None:
+        RATES_CACHE_LOOKUPS.labels("miss").inc()
+        return _refresh_blocking()
+    table = _cached_table(cached, _refresh_in_background)
+    if table is not None:
+        return table
+
+    try:
+        return _refresh_blocking()
+    except CurrencyServiceError:
+        logger.warning("Rates provider unavailable, serving snapshot from %.0f s ago", time.time() - cached[0])
+        return cached[1]
+
+
+async def get_rate_table_async() -> RateTable:
+    """То же, что get_rate_table, но без блокировки event loop на запросе к провайдеру."""
+    cached = _reference_rates_cache
+    if cached is None and not _warm_started:
+        cached = await asyncio.to_thread(_warm_start)
+    if cached is None:
+        RATES_CACHE_LOOKUPS.labels("miss").inc()
+        return await _refresh_async()
+    table = _cached_table(cached, _refresh_async_in_background)
+    if table is not None:
+        return table
+
+    try:
+        return await _refresh_async()
+    except CurrencyServiceError:
+        logger.warning("Rates provider unavailable, serving snapshot from %.0f s ago", time.time() - cached[0])
+        return cached[1]
 
 
 def _parse_rates(payload: Dict[str, Any]) -> Dict[str, float]:
@@ -66,30 +336,43 @@ def _parse_rates(payload: Dict[str, Any]) -> Dict[str, float]:
     return rates
 
 
-def convert_currency(amount: float, base: str, quote: str) -> Tuple[float, float]:
+def get_rate_table() -> RateTable:
+    return _get_reference_rates()
+
+
+def convert_currency(
+    amount: float, base: str, quote: str, table: RateTable | None = None
+) -> Tuple[float, float]:
     base = base.upper()
     quote = quote.upper()
 
     if base == quote:
         return 1.0, amount
 
-    rates = _get_reference_rates()
+    rate = (table or _get_reference_rates()).rate(base, quote)
 
-    def _rate_for(currency: str) -> float:
-        if currency == settings.reference_currency.upper():
-            return 1.0
-        value = rates.get(currency)
-        if value is None:
-            raise CurrencyServiceError("currency pair is not supported")
-        return float(value)
+    converted = round(amount * rate, AMOUNT_DIGITS)
+    return rate, converted
 
-    try:
-        base_rate = _rate_for(base)
-        quote_rate = _rate_for(quote)
-    except CurrencyServiceError:
-        raise
 
-    rate = quote_rate / base_rate
+def convert_many(
+    amounts: Sequence[float],
+    bases: Sequence[str],
+    quotes: Sequence[str],
+    table: RateTable | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Конвертирует пачку сумм по одному снимку курсов.
+
+    Для неподдерживаемых пар курс и результат равны NaN.
+    """
+    amounts_array = np.asarray(amounts, dtype=float)
+    if not len(amounts_array):
+        return np.empty(0), np.empty(0)
+
+    table = table or _get_reference_rates()
+    base_codes = np.char.upper(np.asarray(bases, dtype=str))
+    quote_codes = np.char.upper(np.asarray(quotes, dtype=str))
+    same = base_codes == quote_codes
 
-    converted = round(amount * float(rate), 4)
-    return float(rate), converted
+    pair_rates, converted = table.convert(amounts_array, table.indices(base_codes), table.indices(quote_codes))
+    return np.where(same, 1.0, pair_rates), np.where(same, amounts_array, converted)
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
 import re
-from typing import List
+import string
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
 
 CURRENCY_ALIASES = {
     "USD": {"usd", "dollar", "dollars", "доллар", "долларов", "долл", "$", "бакс", "бакса", "баксов", "зеленых"},
@@ -17,24 +26,205 @@ CURRENCY_ALIASES = {
     "SEK": {"sek"},
     "NOK": {"nok"},
 }
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "₽": "RUB", "¥": "CNY"}
+
+# Суффиксы суммы в порядке перебора: первый подошедший выигрывает.
+AMOUNT_SUFFIXES = ("к", "k", "тыс", "тысяч", "м", "m", "млн", "миллион", "миллионов")
+_AMOUNT_MULTIPLIERS = (
+    ("миллионов", 1_000_000),
+    ("миллиона", 1_000_000),
+    ("миллион", 1_000_000),
+    ("тысяч", 1000),
+    ("тысячи", 1000),
+    ("тысяча", 1000),
+    ("млн", 1_000_000),
+    ("тыс", 1000),
+    ("к", 1000),
+    ("k", 1000),
+    ("м", 1_000_000),
+    ("m", 1_000_000),
+)
+
+_TERMINAL = ""
+# Латиница без учёта регистра, включая символы, которые сворачиваются в ASCII (ı, ſ).
+_LATIN = frozenset(string.ascii_lowercase) | {"ı", "ſ"}
+_DIGITS = re.compile(r"\d+")
+_NON_AMOUNT = re.compile(r"[^\d.-]")
+_ISO_CODE = re.compile(r"[a-z]{3}")
+_WORD = re.compile(r"\S+")
+
+
+def _build_trie(tokens: Iterable[str]) -> dict:
+    root: dict = {}
+    for token in tokens:
+        node = root
+        for char in token.lower():
+            node = node.setdefault(char, {})
+        node[_TERMINAL] = True
+    return root
+
+
+class AliasDictionary:
+    """Скомпилированный словарь алиасов и суффиксов; после сборки не меняется.
+
+    Распознавание берёт ссылку на текущий словарь один раз на текст, поэтому
+    замена словаря при перезагрузке атомарна для запросов в работе.
+    """
+
+    __slots__ = ("version", "codes", "symbols", "suffixes", "multipliers", "trie", "reversed_trie", "joiners")
+
+    _versions = itertools.count(1)
+
+    def __init__(
+        self,
+        aliases: Mapping[str, Iterable[str]],
+        symbols: Mapping[str, str],
+        suffixes: Sequence[str],
+        multipliers: Sequence[Tuple[str, float]],
+    ) -> None:
+        codes: Dict[str, str] = {}
+        for code, code_aliases in aliases.items():
+            for alias in code_aliases:
+                alias = alias.strip().lower()
+                if alias:
+                    codes.setdefault(alias, code.upper())
+        self.version = next(self._versions)
+        self.codes: Mapping[str, str] = MappingProxyType(codes)
+        self.symbols: Mapping[str, str] = MappingProxyType(
+            {symbol.lower(): code.upper() for symbol, code in symbols.items()}
+        )
+        self.suffixes = tuple(suffix.lower() for suffix in suffixes)
+        self.multipliers = tuple((form.lower(), multiplier) for form, multiplier in multipliers)
+        self.trie = _build_trie(codes)
+        self.reversed_trie = _build_trie(alias[::-1] for alias in codes)
+        # Слова многословных алиасов, после которых алиас продолжается через пробел.
+        self.joiners = tuple(sorted({word for alias in codes for word in alias.split(" ")[:-1]}))
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "AliasDictionary":
+        """Словарь из JSON с разделами aliases, symbols, suffixes, multipliers; пропущенные берутся встроенные."""
+        data: Dict[str, Any] = json.loads(Path(path).read_text(encoding="utf-8"))
+        try:
+            multipliers = dict(data.get("multipliers", _AMOUNT_MULTIPLIERS))
+            return cls(
+                aliases=data.get("aliases", CURRENCY_ALIASES),
+                symbols=data.get("symbols", CURRENCY_SYMBOLS),
+                suffixes=data.get("suffixes", AMOUNT_SUFFIXES),
+                multipliers=[(form, float(value)) for form, value in multipliers.items()],
+            )
+        except (AttributeError, TypeError, ValueError) as exc:
+            raise ValueError(f"invalid alias dictionary {path}: {exc}") from exc
+
+    def tables(self) -> Dict[str, Any]:
+        """Исходные таблицы словаря в том виде, в каком их принимает конструктор."""
+        aliases: Dict[str, List[str]] = {}
+        for alias, code in self.codes.items():
+            aliases.setdefault(code, []).append(alias)
+        return {
+            "aliases": aliases,
+            "symbols": dict(self.symbols),
+            "suffixes": list(self.suffixes),
+            "multipliers": [list(pair) for pair in self.multipliers],
+        }
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # В процессы пула уходят исходные таблицы, деревья пересобираются на месте.
+        tables = self.tables()
+        return AliasDictionary, (tables["aliases"], tables["symbols"], tables["suffixes"], self.multipliers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "version": self.version,
+            "aliases": len(self.codes),
+            "currencies": len(set(self.codes.values())),
+            "symbols": len(self.symbols),
+            "suffixes": len(self.suffixes),
+        }
+
+
+_BUILTIN_DICTIONARY = AliasDictionary(CURRENCY_ALIASES, CURRENCY_SYMBOLS, AMOUNT_SUFFIXES, _AMOUNT_MULTIPLIERS)
+_dictionary = _BUILTIN_DICTIONARY
+_reload_lock = threading.Lock()
+# (mtime_ns, size) файла, из которого собран текущий словарь.
+_loaded_stamp: Tuple[int, int] | None = None
+
 
-_alias_tokens = sorted({alias for aliases in CURRENCY_ALIASES.values() for alias in aliases}, key=len, reverse=True)
-_alias_group = "|".join(re.escape(token) for token in _alias_tokens)
-_suffix_tokens = sorted([
-    'миллионов', 'миллиона', 'миллион', 
-    'тысяч', 'тысячи', 'тысяча', 
-    'млн', 'тыс', 'к', 'k', 'м', 'm'
-], key=len, reverse=True)
-_suffix_group = "|".join(re.escape(token) for token in _suffix_tokens)
-AMOUNT_RE = r"\d[\d\s\u00A0\u202F]*(?:[.,]\d+)?\s*(?:[кk]|тыс|тысяч|[мm]|млн|миллион|миллионов)?"
-_CURRENCY_RE = rf"(?:{_alias_group}|[A-Za-z]{{3}}|[$€£¥₽])"
+def get_dictionary() -> AliasDictionary:
+    return _dictionary
 
-CURRENCY_AFTER = re.compile(rf"(?P<amount>{AMOUNT_RE})\s*(?P<currency>{_CURRENCY_RE})", re.IGNORECASE)
-CURRENCY_BEFORE = re.compile(rf"(?P<currency>{_CURRENCY_RE})\s*(?P<amount>{AMOUNT_RE})", re.IGNORECASE)
 
+def _file_stamp(path: str | Path) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_dictionary(path: str | Path | None) -> AliasDictionary:
+    """Собирает словарь из файла (или встроенный, если path пуст) и подменяет текущий целиком."""
+    global _dictionary, _loaded_stamp
+    with _reload_lock:
+        # Отметка снимается до чтения: если файл поменяют во время чтения, следующая проверка перечитает его.
+        stamp = _file_stamp(path) if path else None
+        dictionary = AliasDictionary.from_file(path) if path else _BUILTIN_DICTIONARY
+        _dictionary = dictionary
+        _loaded_stamp = stamp
+    return dictionary
+
+
+class DictionaryWatcher:
+    """Перечитывает словарь, когда меняется его файл (по mtime и размеру).
+
+    Словарь живёт в памяти каждого процесса воркера, а POST /admin/aliases/reload
+    попадает только в один из них; остальные подхватывают новый файл здесь, не
+    позже чем через interval секунд. Битый файл не подменяет текущий словарь и
+    даёт одно предупреждение, пока файл не изменится снова.
+    """
+
+    def __init__(self, path: str | Path | None, interval: float) -> None:
+        self.path = path
+        self.interval = interval
+        self._failed_stamp: Tuple[int, int] | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def check(self) -> AliasDictionary | None:
+        """Новый словарь, если файл изменился и прочитался; иначе None."""
+        try:
+            stamp = _file_stamp(self.path)
+        except OSError as exc:
+            if self._failed_stamp != (0, 0):
+                logger.warning("Alias dictionary %s is not readable: %s", self.path, exc)
+                self._failed_stamp = (0, 0)
+            return None
+        if stamp == _loaded_stamp or stamp == self._failed_stamp:
+            return None
+        try:
+            dictionary = load_dictionary(self.path)
+        except (OSError, ValueError) as exc:
+            logger.warning("Alias dictionary %s changed but was not loaded, keeping the previous one: %s", self.path, exc)
+            self._failed_stamp = stamp
+            return None
+        self._failed_stamp = None
+        logger.info("Alias dictionary %s reloaded: %s", self.path, dictionary.stats())
+        return dictionary
+
+    def start(self) -> None:
+        if not self.path or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="aliases-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+
+class CurrencyMention(NamedTuple):
+    """Упоминание суммы в тексте; кортеж, чтобы не платить за объект на каждое совпадение."""
 
-@dataclass
-class CurrencyMention:
     amount: float
     currency: str
     match_text: str
@@ -42,77 +232,284 @@ class CurrencyMention:
     end: int
 
 
-def _normalize_amount(value: str) -> float | None:
-    value_lower=value.lower().strip()
+def _normalize_amount(value: str, dictionary: AliasDictionary | None = None) -> float | None:
     sanitized = (
         value.replace("\u00A0", "")
         .replace("\u202F", "")
         .replace(" ", "")
         .replace(",", ".")
     )
-    
+
     if sanitized.endswith('.'):
         sanitized = sanitized[:-1]
-    suffixes = [
-        ('миллионов', 1_000_000),
-        ('миллиона', 1_000_000),
-        ('миллион', 1_000_000),
-        ('тысяч', 1000),
-        ('тысячи', 1000),
-        ('тысяча', 1000),
-        ('млн', 1_000_000),
-        ('тыс', 1000),
-        ('к', 1000),
-        ('k', 1000),
-        ('м', 1_000_000),
-        ('m', 1_000_000),
-    ]
     multiplier = 1
-    for suffix, mult in suffixes:
+    for suffix, mult in (dictionary or _dictionary).multipliers:
         if sanitized.endswith(suffix):
             multiplier = mult
             sanitized = sanitized[:-len(suffix)]
             break
 
-
-
-
-    sanitized = re.sub(r'[^\d.-]', '', sanitized)
+    sanitized = _NON_AMOUNT.sub('', sanitized)
     try:
         return float(sanitized)*multiplier
     except ValueError:
         return None
 
 
-def _normalize_currency(token: str) -> str | None:
+def _normalize_currency(token: str, dictionary: AliasDictionary | None = None) -> str | None:
+    dictionary = dictionary or _dictionary
     cleaned = token.strip().lower()
-    for code, aliases in CURRENCY_ALIASES.items():
-        if cleaned in aliases:
-            return code
-    if re.fullmatch(r"[a-z]{3}", cleaned):
+    code = dictionary.codes.get(cleaned)
+    if code is not None:
+        return code
+    if _ISO_CODE.fullmatch(cleaned):
         return cleaned.upper()
-    symbols = {"$": "USD", "€": "EUR", "£": "GBP", "₽": "RUB", "¥": "CNY"}
-    return symbols.get(token.strip())
-
-
-def extract_currency_mentions(text: str) -> List[CurrencyMention]:
-    mentions: List[CurrencyMention] = []
-    for pattern in (CURRENCY_AFTER, CURRENCY_BEFORE):
-        for match in pattern.finditer(text):
-            amount_value = _normalize_amount(match.group("amount"))
-            currency_code = _normalize_currency(match.group("currency"))
-            if amount_value is None or currency_code is None:
-                continue
-            span = match.span()
-            mention = CurrencyMention(
-                amount=amount_value,
-                currency=currency_code,
-                match_text=text[span[0] : span[1]],
-                start=span[0],
-                end=span[1],
-            )
-            mentions.append(mention)
+    return dictionary.symbols.get(cleaned)
+
+
+def _fold(text: str) -> str:
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(char.lower()[0] for char in text)
+
+
+def _skip_spaces(text: str, pos: int) -> int:
+    size = len(text)
+    while pos < size and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _scan_run(text: str, pos: int) -> int:
+    size = len(text)
+    pos += 1
+    while pos < size and (text[pos].isdecimal() or text[pos].isspace()):
+        pos += 1
+    return pos
+
+
+def _scan_fraction(text: str, pos: int) -> int:
+    size = len(text)
+    if pos + 1 < size and text[pos] in ".," and text[pos + 1].isdecimal():
+        pos += 2
+        while pos < size and text[pos].isdecimal():
+            pos += 1
+    return pos
+
+
+def _currency_end(folded: str, pos: int, dictionary: AliasDictionary) -> int | None:
+    """Конец самого приоритетного валютного токена, начинающегося в pos."""
+    size = len(folded)
+    end = None
+    node = dictionary.trie
+    cursor = pos
+    while cursor < size:
+        node = node.get(folded[cursor])
+        if node is None:
+            break
+        cursor += 1
+        if _TERMINAL in node:
+            end = cursor
+    if end is not None:
+        return end
+    if pos + 3 <= size and folded[pos] in _LATIN and folded[pos + 1] in _LATIN and folded[pos + 2] in _LATIN:
+        return pos + 3
+    if pos < size and folded[pos] in dictionary.symbols:
+        return pos + 1
+    return None
+
+
+def _currency_start(folded: str, end: int, low: int, dictionary: AliasDictionary) -> int | None:
+    """Самое левое (не раньше low) начало валютного токена, заканчивающегося в end."""
+    start = None
+    node = dictionary.reversed_trie
+    cursor = end
+    while cursor > low:
+        node = node.get(folded[cursor - 1])
+        if node is None:
+            break
+        cursor -= 1
+        if _TERMINAL in node:
+            start = cursor
+    if end - 3 >= low and folded[end - 1] in _LATIN and folded[end - 2] in _LATIN and folded[end - 3] in _LATIN:
+        if start is None or end - 3 < start:
+            start = end - 3
+    if start is None and end - 1 >= low and folded[end - 1] in dictionary.symbols:
+        start = end - 1
+    return start
+
+
+def _amount_after(folded: str, run_end: int, dictionary: AliasDictionary) -> Tuple[int, int, int] | None:
+    """Хвост суммы перед валютой: (конец суммы, начало валюты, конец валюты)."""
+    spaced = _skip_spaces(folded, _scan_fraction(folded, run_end))
+    for suffix in dictionary.suffixes:
+        if folded.startswith(suffix, spaced):
+            amount_end = spaced + len(suffix)
+            currency_start = _skip_spaces(folded, amount_end)
+            currency_end = _currency_end(folded, currency_start, dictionary)
+            if currency_end is not None:
+                return amount_end, currency_start, currency_end
+    currency_end = _currency_end(folded, spaced, dictionary)
+    if currency_end is not None:
+        return spaced, spaced, currency_end
+    return None
+
+
+def _amount_end(folded: str, start: int, dictionary: AliasDictionary) -> int:
+    spaced = _skip_spaces(folded, _scan_fraction(folded, _scan_run(folded, start)))
+    for suffix in dictionary.suffixes:
+        if folded.startswith(suffix, spaced):
+            return spaced + len(suffix)
+    return spaced
+
+
+def _mention(
+    text: str, start: int, end: int, amount: str, currency: str, dictionary: AliasDictionary
+) -> CurrencyMention | None:
+    amount_value = _normalize_amount(amount, dictionary)
+    currency_code = _normalize_currency(currency, dictionary)
+    if amount_value is None or currency_code is None:
+        return None
+    return CurrencyMention(amount_value, currency_code, text[start:end], start, end)
+
+
+def extract_currency_mentions(text: str, dictionary: AliasDictionary | None = None) -> List[CurrencyMention]:
+    """Находит суммы с валютой после ("100 usd") и перед ("$100") числом за один проход.
+
+    Сканер идёт по группам цифр слева направо и для каждой смотрит соседние
+    валютные токены по префиксным деревьям алиасов (прямому и обратному).
+    Результат совпадает с поиском по шаблонам «сумма-валюта» и «валюта-сумма».
+    Отката нет: каждый символ просматривается ограниченное число раз (не больше
+    длины самого длинного алиаса), поэтому время линейно по длине текста.
+    """
+    dictionary = dictionary or _dictionary
+    folded = _fold(text)
+    after: List[CurrencyMention] = []
+    before: List[CurrencyMention] = []
+    after_from = 0
+    before_from = 0
+    for digits in _DIGITS.finditer(folded):
+        start = digits.start()
+
+        if start >= before_from:
+            spaced_from = start
+            while spaced_from > 0 and folded[spaced_from - 1].isspace():
+                spaced_from -= 1
+            currency_start = _currency_start(folded, spaced_from, before_from, dictionary)
+            if currency_start is None:
+                before_from = start
+            else:
+                before_from = _amount_end(folded, start, dictionary)
+                mention = _mention(
+                    text,
+                    currency_start,
+                    before_from,
+                    text[start:before_from],
+                    text[currency_start:spaced_from],
+                    dictionary,
+                )
+                if mention is not None:
+                    before.append(mention)
+
+        if start >= after_from:
+            run_end = _scan_run(folded, start)
+            found = _amount_after(folded, run_end, dictionary)
+            if found is None:
+                after_from = run_end
+            else:
+                amount_end, currency_start, after_from = found
+                mention = _mention(
+                    text, start, after_from, text[start:amount_end], text[currency_start:after_from], dictionary
+                )
+                if mention is not None:
+                    after.append(mention)
+
     unique: dict[tuple[int, int, str, float], CurrencyMention] = {}
-    for item in mentions:
+    for item in after + before:
         unique[(item.start, item.end, item.currency, item.amount)] = item
     return list(unique.values())
+
+
+def _separates(previous: str, word: str, dictionary: AliasDictionary) -> bool:
+    """Можно ли резать текст перед word, если перед ним стоит слово previous.
+
+    Это пара «A пробелы B пробел», где в A и B нет цифр, A не является
+    суффиксом суммы и не начинает многословный алиас. Упоминание содержит
+    цифры, а между словами без цифр его продолжают только суффикс или такой
+    алиас, поэтому куски по обе стороны разбираются независимо.
+    """
+    return (
+        not _DIGITS.search(word)
+        and not _DIGITS.search(previous)
+        and previous not in dictionary.suffixes
+        and not previous.endswith(dictionary.joiners)
+    )
+
+
+class StreamingExtractor:
+    """Поиск упоминаний в тексте, приходящем кусками, с абсолютными смещениями.
+
+    Текст копится до безопасной границы (см. _separates) и разбирается по частям,
+    так что упоминание на стыке кусков не теряется, а память ограничена
+    max_buffer символами. Каждый кусок просматривается один раз: позиция
+    просмотра, последнее полное слово и найденная граница хранятся между
+    вызовами feed. Если граница не находится и в max_buffer символах (сплошные
+    цифры или одно огромное слово), буфер режется по последнему пробелу: память
+    важнее, но упоминание на таком разрезе может разделиться или потеряться.
+    Такие разрезы считаются в forced_cuts.
+    """
+
+    def __init__(self, max_buffer: int = 65536, dictionary: AliasDictionary | None = None) -> None:
+        self.max_buffer = max_buffer
+        self.dictionary = dictionary or _dictionary
+        self._buffer = ""
+        self._folded = ""
+        self._offset = 0
+        # Откуда продолжать поиск слов: конец последнего полного слова или начало
+        # слова, которое упирается в конец буфера и может продолжиться.
+        self._scanned = 0
+        self._previous: str | None = None
+        self._cut: int | None = None
+        self.forced_cuts = 0
+
+    def _take(self, cut: int) -> List[CurrencyMention]:
+        head, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        self._folded = self._folded[cut:]
+        self._scanned = max(self._scanned - cut, 0)
+        if self._cut is not None:
+            self._cut = self._cut - cut if self._cut > cut else None
+        offset = self._offset
+        self._offset += cut
+        return [
+            CurrencyMention(amount, currency, match_text, start + offset, end + offset)
+            for amount, currency, match_text, start, end in extract_currency_mentions(head, self.dictionary)
+        ]
+
+    def _scan(self) -> None:
+        end = len(self._folded)
+        for word in _WORD.finditer(self._folded, self._scanned):
+            if word.end() == end:
+                self._scanned = word.start()
+                return
+            text = word.group()
+            if self._previous is not None and _separates(self._previous, text, self.dictionary):
+                self._cut = word.start()
+            self._previous = text
+            self._scanned = word.end()
+        self._scanned = end
+
+    def feed(self, chunk: str) -> List[CurrencyMention]:
+        self._buffer += chunk
+        self._folded += _fold(chunk)
+        self._scan()
+        cut = self._cut
+        if cut is None and len(self._buffer) > self.max_buffer:
+            cut = max(self._buffer.rfind(" "), self._buffer.rfind("\n")) + 1 or len(self._buffer)
+            self.forced_cuts += 1
+            if cut == len(self._buffer):
+                self._previous = None
+        return self._take(cut) if cut else []
+
+    def close(self) -> List[CurrencyMention]:
+        return self._take(len(self._buffer))
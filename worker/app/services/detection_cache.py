@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Generic, Hashable, List, Sequence, Tuple, TypeVar
+
+from ..config import get_settings
+from ..metrics import DETECTION_CACHE_LOOKUPS
+from .currency import RateTable
+from .currency_extractor import CurrencyMention, extract_currency_mentions, get_dictionary
+
+settings = get_settings()
+
+V = TypeVar("V")
+TextKey = Tuple[int, bytes]
+
+
+class LRUCache(Generic[V]):
+    """Потокобезопасный LRU-кэш с ограничением числа записей и временем жизни."""
+
+    def __init__(self, name: str, max_size: int, ttl: float) -> None:
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict[Hashable, Tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> V | None:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and now - item[0] <= self.ttl:
+                self._items.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                hit = False
+        DETECTION_CACHE_LOOKUPS.labels(self.name, "hit" if hit else "miss").inc()
+        return item[1] if hit else None
+
+    def put(self, key: Hashable, value: V) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, int | float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "capacity": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class DetectionCache:
+    """Кэш распознавания для повторяющихся текстов (репосты и пересылки).
+
+    Упоминания зависят только от текста и переживают обновление курсов; готовые
+    ответы привязаны к снимку курсов и сбрасываются, как только приходит новый.
+    Ключ - хэш точного текста (нормализация сдвинула бы start/end упоминаний)
+    и версия словаря алиасов, так что перезагрузка словаря тоже сбрасывает кэш.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.mentions_cache: LRUCache[List[CurrencyMention]] = LRUCache("mentions", max_size, ttl)
+        self.responses_cache: LRUCache[Any] = LRUCache("responses", max_size, ttl)
+        self._table: RateTable | None = None
+        self._table_lock = threading.Lock()
+
+    @staticmethod
+    def text_key(text: str) -> TextKey:
+        return get_dictionary().version, hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def mentions(self, text_key: TextKey, text: str) -> List[CurrencyMention]:
+        mentions = self.mentions_cache.get(text_key)
+        if mentions is None:
+            mentions = extract_currency_mentions(text)
+            self.mentions_cache.put(text_key, mentions)
+        return mentions
+
+    def _check_table(self, table: RateTable) -> None:
+        if table is not self._table:
+            with self._table_lock:
+                if table is not self._table:
+                    self.responses_cache.clear()
+                    self._table = table
+
+    def get_response(self, text_key: TextKey, targets: Sequence[str], table: RateTable) -> Any | None:
+        self._check_table(table)
+        return self.responses_cache.get((text_key, tuple(targets)))
+
+    def put_response(self, text_key: TextKey, targets: Sequence[str], table: RateTable, value: Any) -> None:
+        self._check_table(table)
+        with self._table_lock:
+            if table is self._table:
+                self.responses_cache.put((text_key, tuple(targets)), value)
+
+    def clear(self) -> None:
+        self.mentions_cache.clear()
+        self.responses_cache.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int | float]]:
+        return {"mentions": self.mentions_cache.stats(), "responses": self.responses_cache.stats()}
+
+
+detection_cache = DetectionCache(
+    max_size=settings.detection_cache_size,
+    ttl=settings.detection_cache_ttl,
+)
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from collections import Counter
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Dict
+
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", code.co_filename)
+    return f"{module}:{code.co_name}"
+
+
+def _stack(frame: FrameType | None) -> list[str]:
+    labels: list[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def sample_stacks(duration: float, interval: float = 0.005) -> Dict[str, int]:
+    """Снимает стеки всех потоков процесса каждые interval секунд в течение duration.
+
+    Возвращает счётчики в свёрнутом формате flamegraph: "поток;кадр;...;кадр" -> число выборок.
+    Одновременно работает только один профиль.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("profiler is already running")
+    try:
+        own_id = threading.get_ident()
+        counts: Counter[str] = Counter()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _stack(frame)
+                stack.insert(0, names.get(thread_id, str(thread_id)).replace(";", "_"))
+                counts[";".join(stack)] += 1
+            time.sleep(interval)
+        return dict(counts)
+    finally:
+        _profile_lock.release()
+
+
+def collapse(counts: Dict[str, int]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
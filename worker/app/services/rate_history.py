@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+import json
+import logging
+from pathlib import Path
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .. import models
+from ..config import get_settings
+from ..db import SessionLocal
+from .currency import CurrencyServiceError, RateTable, _parse_rates
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class HistoricalRatesUnavailable(CurrencyServiceError):
+    pass
+
+
+_index: Tuple[List[date], List[Dict[str, float]]] | None = None
+_index_loaded_at = 0.0
+_index_lock = threading.Lock()
+
+
+def _payload_date(payload: Dict[str, Any]) -> date:
+    value = payload.get("Date") or payload.get("date")
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).date()
+        except ValueError as exc:
+            raise CurrencyServiceError("invalid rates date") from exc
+    timestamp = payload.get("timestamp")
+    if isinstance(timestamp, (int, float)):
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).date()
+    raise CurrencyServiceError("rates date is missing")
+
+
+def _load_index() -> Tuple[List[date], List[Dict[str, float]]]:
+    """Индекс истории в памяти; перечитывается раз в currency_cache_ttl, чтобы видеть чужие загрузки."""
+    global _index, _index_loaded_at
+    index = _index
+    if index is not None and time.time() - _index_loaded_at <= settings.currency_cache_ttl:
+        return index
+    with _index_lock:
+        if _index is not None and time.time() - _index_loaded_at <= settings.currency_cache_ttl:
+            return _index
+        session = SessionLocal()
+        try:
+            rows = session.execute(
+                select(models.DailyRate.rate_date, models.DailyRate.rates)
+                .where(models.DailyRate.reference_currency == settings.reference_currency.upper())
+                .order_by(models.DailyRate.rate_date)
+            ).all()
+        except SQLAlchemyError as exc:
+            raise CurrencyServiceError("rate history is unavailable") from exc
+        finally:
+            session.close()
+        _table_at.cache_clear()
+        _index = ([row.rate_date for row in rows], [row.rates for row in rows])
+        _index_loaded_at = time.time()
+        return _index
+
+
+@lru_cache(maxsize=256)
+def _table_at(rate_date: date) -> RateTable:
+    dates, rates = _load_index()
+    return RateTable(rates[bisect_right(dates, rate_date) - 1], settings.reference_currency.upper())
+
+
+def rate_date_for(as_of: date) -> date:
+    """Дата курсов, действовавших на as_of: последняя известная не позже неё."""
+    dates, _ = _load_index()
+    position = bisect_right(dates, as_of)
+    if not position or as_of - dates[position - 1] > timedelta(days=settings.historical_rates_max_gap_days):
+        raise HistoricalRatesUnavailable(f"no rates stored for {as_of.isoformat()}")
+    return dates[position - 1]
+
+
+def get_historical_table(as_of: date) -> Tuple[date, RateTable]:
+    rate_date = rate_date_for(as_of)
+    return rate_date, _table_at(rate_date)
+
+
+def convert_historical(
+    amounts: Sequence[float], bases: Sequence[str], quotes: Sequence[str], dates: Sequence[date]
+) -> Tuple[List[date | None], np.ndarray, np.ndarray]:
+    """Конвертирует пачку сумм по курсам на заданные даты, группируя строки по дате курса.
+
+    Для дат без истории и неподдерживаемых пар курс и результат равны NaN.
+    """
+    amounts_array = np.asarray(amounts, dtype=float)
+    base_codes = np.char.upper(np.asarray(bases, dtype=str))
+    quote_codes = np.char.upper(np.asarray(quotes, dtype=str))
+    rates = np.full(len(amounts_array), np.nan)
+    converted = np.full(len(amounts_array), np.nan)
+
+    rate_dates: List[date | None] = []
+    groups: Dict[date, List[int]] = {}
+    for position, as_of in enumerate(dates):
+        try:
+            rate_date = rate_date_for(as_of)
+        except HistoricalRatesUnavailable:
+            rate_dates.append(None)
+            continue
+        rate_dates.append(rate_date)
+        groups.setdefault(rate_date, []).append(position)
+
+    for rate_date, positions in groups.items():
+        table = _table_at(rate_date)
+        selected = np.asarray(positions, dtype=np.intp)
+        rates[selected], converted[selected] = table.convert(
+            amounts_array[selected], table.indices(base_codes[selected]), table.indices(quote_codes[selected])
+        )
+
+    same = base_codes == quote_codes
+    rates = np.where(same, 1.0, rates)
+    converted = np.where(same, amounts_array, converted)
+    return rate_dates, rates, converted
+
+
+def _iter_rate_files(paths: Iterable[str | Path]) -> Iterable[Path]:
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(item for item in path.rglob("*") if item.suffix in {".json", ".js"})
+        else:
+            yield path
+
+
+def backfill(paths: Iterable[str | Path]) -> int:
+    """Загружает дневные файлы курсов в историю; повторная загрузка даты её перезаписывает."""
+    global _index
+    reference = settings.reference_currency.upper()
+    daily: Dict[date, Dict[str, float]] = {}
+    for path in _iter_rate_files(paths):
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            daily[_payload_date(payload)] = _parse_rates(payload)
+        except (OSError, ValueError, CurrencyServiceError):
+            logger.warning("Skipping rates file %s", path, exc_info=True)
+    if not daily:
+        return 0
+
+    session = SessionLocal()
+    try:
+        existing = {
+            row.rate_date: row
+            for row in session.scalars(
+                select(models.DailyRate).where(
+                    models.DailyRate.reference_currency == reference,
+                    models.DailyRate.rate_date.in_(list(daily)),
+                )
+            )
+        }
+        for rate_date, rates in daily.items():
+            row = existing.get(rate_date)
+            if row is None:
+                session.add(models.DailyRate(reference_currency=reference, rate_date=rate_date, rates=rates))
+            else:
+                row.rates = rates
+        session.commit()
+    except SQLAlchemyError as exc:
+        session.rollback()
+        raise CurrencyServiceError("failed to store rate history") from exc
+    finally:
+        session.close()
+
+    with _index_lock:
+        _index = None
+    return len(daily)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+from typing import Dict
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from .. import models
+from ..db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredSnapshot:
+    id: int
+    checked_at: float
+    rates: Dict[str, float]
+
+
+def rates_hash(reference: str, rates: Dict[str, float]) -> str:
+    encoded = json.dumps([reference, sorted(rates.items())], separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _timestamp(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def save_snapshot(reference: str, rates: Dict[str, float]) -> int | None:
+    """Сохраняет набор курсов один раз; для уже известного набора обновляет checked_at."""
+    digest = rates_hash(reference, rates)
+    now = datetime.now(timezone.utc)
+    session = SessionLocal()
+    try:
+        snapshot = session.scalar(
+            select(models.RateSnapshot).where(models.RateSnapshot.rates_hash == digest)
+        )
+        if snapshot is None:
+            snapshot = models.RateSnapshot(
+                reference_currency=reference,
+                rates=rates,
+                rates_hash=digest,
+                checked_at=now,
+            )
+            session.add(snapshot)
+        else:
+            snapshot.checked_at = now
+        session.commit()
+        return snapshot.id
+    except IntegrityError:
+        session.rollback()
+        return session.scalar(
+            select(models.RateSnapshot.id).where(models.RateSnapshot.rates_hash == digest)
+        )
+    except SQLAlchemyError:
+        session.rollback()
+        logger.warning("Failed to store rate snapshot", exc_info=True)
+        return None
+    finally:
+        session.close()
+
+
+def load_latest_snapshot(reference: str) -> StoredSnapshot | None:
+    session = SessionLocal()
+    try:
+        snapshot = session.scalar(
+            select(models.RateSnapshot)
+            .where(models.RateSnapshot.reference_currency == reference)
+            .order_by(models.RateSnapshot.checked_at.desc())
+            .limit(1)
+        )
+        if snapshot is None:
+            return None
+        return StoredSnapshot(
+            id=snapshot.id,
+            checked_at=_timestamp(snapshot.checked_at),
+            rates={code: float(value) for code, value in snapshot.rates.items()},
+        )
+    except SQLAlchemyError:
+        logger.warning("Failed to load rate snapshot", exc_info=True)
+        return None
+    finally:
+        session.close()
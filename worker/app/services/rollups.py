@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.orm import Session
+
+from .. import models
+
+GRANULARITIES = ("minute", "hour", "day")
+_UPSERT_CHUNK = 1000
+
+_BucketKey = Tuple[str, datetime, str, str]
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    moment = moment.astimezone(timezone.utc).replace(second=0, microsecond=0)
+    if granularity in ("hour", "day"):
+        moment = moment.replace(minute=0)
+    if granularity == "day":
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _aggregate(rows: Iterable[Dict[str, Any]], buckets: Dict[_BucketKey, List[float]]) -> None:
+    for row in rows:
+        created_at = row.get("created_at") or datetime.now(timezone.utc)
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(created_at, granularity), row["base_currency"], row["quote_currency"])
+            totals = buckets.get(key)
+            if totals is None:
+                totals = buckets[key] = [0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += row["amount"]
+            totals[2] += row["converted_amount"]
+
+
+def _upsert(session: Session, buckets: Dict[_BucketKey, List[float]]) -> None:
+    if not buckets:
+        return
+    rollup = models.ConversionRollup
+    values = [
+        {
+            "granularity": granularity,
+            "bucket_start": start,
+            "base_currency": base,
+            "quote_currency": quote,
+            "count": int(count),
+            "amount_sum": amount_sum,
+            "converted_sum": converted_sum,
+        }
+        for (granularity, start, base, quote), (count, amount_sum, converted_sum) in sorted(buckets.items())
+    ]
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        for offset in range(0, len(values), _UPSERT_CHUNK):
+            statement = insert(rollup).values(values[offset : offset + _UPSERT_CHUNK])
+            statement = statement.on_conflict_do_update(
+                index_elements=["granularity", "bucket_start", "base_currency", "quote_currency"],
+                set_={
+                    "count": rollup.count + statement.excluded.count,
+                    "amount_sum": rollup.amount_sum + statement.excluded.amount_sum,
+                    "converted_sum": rollup.converted_sum + statement.excluded.converted_sum,
+                },
+            )
+            session.execute(statement)
+        return
+
+    for value in values:
+        updated = session.execute(
+            update(rollup)
+            .where(
+                rollup.granularity == value["granularity"],
+                rollup.bucket_start == value["bucket_start"],
+                rollup.base_currency == value["base_currency"],
+                rollup.quote_currency == value["quote_currency"],
+            )
+            .values(
+                count=rollup.count + value["count"],
+                amount_sum=rollup.amount_sum + value["amount_sum"],
+                converted_sum=rollup.converted_sum + value["converted_sum"],
+            )
+        )
+        if not updated.rowcount:
+            session.add(rollup(**value))
+
+
+def apply_rollups(session: Session, rows: Iterable[Dict[str, Any]]) -> None:
+    """Добавляет строки конвертаций в поминутные, почасовые и дневные агрегаты в той же транзакции."""
+    buckets: Dict[_BucketKey, List[float]] = {}
+    _aggregate(rows, buckets)
+    _upsert(session, buckets)
+
+
+def rebuild_rollups(session: Session, chunk_size: int = 10000) -> int:
+    """Пересчитывает агрегаты по всей истории конвертаций; возвращает число учтённых строк."""
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("LOCK TABLE currency_conversions IN SHARE MODE"))
+    session.execute(delete(models.ConversionRollup))
+    conversion = models.CurrencyConversion
+    result = session.execute(
+        select(
+            conversion.created_at,
+            conversion.base_currency,
+            conversion.quote_currency,
+            conversion.amount,
+            conversion.converted_amount,
+        ).execution_options(yield_per=chunk_size)
+    )
+    buckets: Dict[_BucketKey, List[float]] = {}
+    total = 0
+    for rows in result.mappings().partitions():
+        _aggregate(rows, buckets)
+        total += len(rows)
+        if len(buckets) >= chunk_size:
+            _upsert(session, buckets)
+            buckets.clear()
+    _upsert(session, buckets)
+    return total
+
+
+def read_stats(
+    session: Session,
+    granularity: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    base_currency: str | None = None,
+    quote_currency: str | None = None,
+    max_buckets: int = 1000,
+) -> Tuple[List[models.ConversionRollup], List[Any]]:
+    rollup = models.ConversionRollup
+    conditions = [rollup.granularity == granularity]
+    if since is not None:
+        conditions.append(rollup.bucket_start >= bucket_start(since, granularity))
+    if until is not None:
+        conditions.append(rollup.bucket_start < until)
+    if base_currency:
+        conditions.append(rollup.base_currency == base_currency.upper())
+    if quote_currency:
+        conditions.append(rollup.quote_currency == quote_currency.upper())
+
+    pairs = session.execute(
+        select(
+            rollup.base_currency,
+            rollup.quote_currency,
+            func.sum(rollup.count).label("count"),
+            func.sum(rollup.amount_sum).label("amount_sum"),
+            func.sum(rollup.converted_sum).label("converted_sum"),
+        )
+        .where(*conditions)
+        .group_by(rollup.base_currency, rollup.quote_currency)
+        .order_by(func.sum(rollup.count).desc())
+    ).all()
+    buckets = list(
+        session.scalars(
+            select(rollup)
+            .where(*conditions)
+            .order_by(rollup.bucket_start.desc(), rollup.base_currency, rollup.quote_currency)
+            .limit(max_buckets)
+        )
+    )
+    return buckets, pairs
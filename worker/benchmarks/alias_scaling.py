@@ -0,0 +1,104 @@
+"""Стоимость распознавания в зависимости от размера словаря алиасов.
+
+Синтетические словари от десятков до тысяч алиасов (коды ISO 4217 и русские
+словоформы) собираются в AliasDictionary, после чего на одном и том же корпусе
+меряются сборка словаря и время распознавания на сообщение. Поиск идёт по
+префиксному дереву, поэтому время на сообщение не должно расти со словарём.
+
+    python -m benchmarks.alias_scaling --output alias_scaling.json
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+from pathlib import Path
+import random
+import string
+import sys
+import time
+from typing import Dict, List, Sequence, Set
+
+from app.services.currency_extractor import (
+    AMOUNT_SUFFIXES,
+    CURRENCY_ALIASES,
+    CURRENCY_SYMBOLS,
+    AliasDictionary,
+    _AMOUNT_MULTIPLIERS,
+    extract_currency_mentions,
+)
+
+from .corpus import chat_messages, long_texts
+
+_ENDINGS = ("", "а", "у", "ом", "ы", "ов", "ам", "ами", "ах", "е")
+_STEMS = ("тугрик", "динар", "дирхам", "лир", "крон", "злот", "франк", "песо", "вон", "рупи", "бат", "шекел")
+
+
+def synthetic_aliases(size: int, seed: int = 1) -> Dict[str, Set[str]]:
+    """Встроенные алиасы плюс синтетические коды и словоформы до size алиасов."""
+    rng = random.Random(seed)
+    aliases = {code: set(values) for code, values in CURRENCY_ALIASES.items()}
+    total = sum(len(values) for values in aliases.values())
+    codes = ("".join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=3))
+    for code in codes:
+        if total >= size:
+            break
+        if code in aliases:
+            continue
+        stem = rng.choice(_STEMS) + "".join(rng.choice("абвгдклмнпрст") for _ in range(rng.randint(2, 4)))
+        forms = {code.lower()} | {stem + ending for ending in _ENDINGS}
+        aliases[code] = set(itertools.islice(forms, max(size - total, 0)))
+        total += len(aliases[code])
+    return aliases
+
+
+def _per_call_us(dictionary: AliasDictionary, texts: Sequence[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            extract_currency_mentions(text, dictionary)
+        best = min(best, (time.perf_counter() - started) / len(texts))
+    return round(best * 1e6, 3)
+
+
+def run(sizes: Sequence[int], repeat: int) -> List[Dict[str, float]]:
+    messages = chat_messages(3000)
+    texts = long_texts(20)
+    results: List[Dict[str, float]] = []
+    for size in sizes:
+        aliases = synthetic_aliases(size)
+        started = time.perf_counter()
+        dictionary = AliasDictionary(aliases, CURRENCY_SYMBOLS, AMOUNT_SUFFIXES, _AMOUNT_MULTIPLIERS)
+        compile_ms = (time.perf_counter() - started) * 1000
+        results.append(
+            {
+                "aliases": len(dictionary.codes),
+                "compile_ms": round(compile_ms, 3),
+                "chat_us_per_message": _per_call_us(dictionary, messages, repeat),
+                "long_us_per_text": _per_call_us(dictionary, texts, repeat),
+            }
+        )
+    return results
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--sizes", default="50,200,1000,5000,20000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run([int(size) for size in args.sizes.split(",")], args.repeat)
+    for row in results:
+        print(
+            f"{row['aliases']:6} aliases  compile {row['compile_ms']:9} ms  "
+            f"chat {row['chat_us_per_message']:8} us/msg  long {row['long_us_per_text']:9} us/text"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
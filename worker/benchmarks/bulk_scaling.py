@@ -0,0 +1,79 @@
+"""Масштабирование BulkExtractor по числу процессов.
+
+Один и тот же корпус чатовых сообщений разбирается в текущем процессе и пулом
+из 2, 4, ... процессов (до числа ядер); печатается пропускная способность и
+эффективность относительно одного процесса (1.0 - идеально линейно).
+
+    python -m benchmarks.bulk_scaling --messages 200000 --output bulk_scaling.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Dict, List, Sequence
+
+from app.services.bulk_extraction import BulkExtractor
+
+from .corpus import chat_messages
+
+
+def _worker_counts(limit: int) -> List[int]:
+    counts = [1]
+    while counts[-1] * 2 <= limit:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != limit:
+        counts.append(limit)
+    return counts
+
+
+def run(messages: Sequence[str], worker_counts: Sequence[int], chunk_size: int) -> List[Dict[str, float]]:
+    results: List[Dict[str, float]] = []
+    for workers in worker_counts:
+        extractor = BulkExtractor(workers, chunk_size)
+        try:
+            # Прогрев: запуск процессов и импорт в них не входят в замер.
+            extractor.extract_columns(messages[: chunk_size * workers])
+            started = time.perf_counter()
+            mentions = len(extractor.extract_columns(messages))
+            elapsed = time.perf_counter() - started
+        finally:
+            extractor.shutdown()
+        throughput = len(messages) / elapsed
+        single = results[0]["texts_per_second"] if results else throughput
+        results.append(
+            {
+                "workers": workers,
+                "mentions": mentions,
+                "seconds": round(elapsed, 3),
+                "texts_per_second": round(throughput, 1),
+                "efficiency": round(throughput / single / workers, 3),
+            }
+        )
+    return results
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    results = run(chat_messages(args.messages), _worker_counts(args.max_workers), args.chunk_size)
+    for row in results:
+        print(
+            f"{row['workers']:3} workers  {row['seconds']:8} s  "
+            f"{row['texts_per_second']:10} texts/s  efficiency {row['efficiency']}"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
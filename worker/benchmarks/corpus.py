@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import random
+from typing import List
+
+_RU_PLAIN = [
+    "привет, как дела?",
+    "завтра созвон в 10:30, не забудь",
+    "скинь, пожалуйста, презентацию к встрече",
+    "мы уже на месте, подходите ко второму входу",
+    "в 2023 году переехали в новый офис на 5 этаже",
+    "я перезвоню через 15 минут",
+    "ок, договорились",
+    "сегодня 3 пары, потом тренировка",
+]
+_RU_MONEY = [
+    "купил пиццу за {amount} {ru_currency}",
+    "аренда выходит {amount} {ru_currency} в месяц",
+    "скинулись по {amount}{suffix} {ru_currency} на подарок",
+    "ноутбук подорожал до {amount} {ru_currency}, а был {amount2} {ru_currency}",
+    "зарплату подняли на {amount}{suffix} {ru_currency}",
+    "билеты по {symbol}{amount} туда и обратно",
+]
+_EN_PLAIN = [
+    "hey, are we still on for tomorrow?",
+    "the meeting moved to 3pm, room 204",
+    "sent you the draft, take a look when you can",
+    "lol no way",
+    "running 10 minutes late, sorry",
+]
+_EN_MONEY = [
+    "the price is {amount} {en_currency}",
+    "paid {symbol}{amount} for the tickets",
+    "rent went up by {amount}{suffix} {en_currency}",
+    "budget is {amount} {en_currency} for the whole trip",
+]
+_RU_CURRENCIES = ["рублей", "руб", "долларов", "баксов", "евро", "юаней", "тенге", "р"]
+_EN_CURRENCIES = ["usd", "eur", "dollars", "euro", "rub", "cny", "kzt"]
+_SYMBOLS = ["$", "€", "₽", "¥", "£"]
+_SUFFIXES = ["", "", "", "к", "k", "млн", " тыс"]
+
+
+def _amount(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.5:
+        return str(rng.randint(1, 999))
+    if kind < 0.75:
+        return f"{rng.randint(1, 99)},{rng.randint(0, 99):02d}"
+    if kind < 0.9:
+        return f"{rng.randint(1, 99)} {rng.randint(0, 999):03d}"
+    return f"{rng.randint(1, 9)}.{rng.randint(1, 9)}"
+
+
+def chat_messages(count: int, money_share: float = 0.3, seed: int = 42) -> List[str]:
+    """Детерминированный набор сообщений чата на русском и английском; money_share из них с суммами."""
+    rng = random.Random(seed)
+    messages: List[str] = []
+    for _ in range(count):
+        english = rng.random() < 0.3
+        if rng.random() >= money_share:
+            messages.append(rng.choice(_EN_PLAIN if english else _RU_PLAIN))
+            continue
+        template = rng.choice(_EN_MONEY if english else _RU_MONEY)
+        messages.append(
+            template.format(
+                amount=_amount(rng),
+                amount2=_amount(rng),
+                suffix=rng.choice(_SUFFIXES),
+                symbol=rng.choice(_SYMBOLS),
+                ru_currency=rng.choice(_RU_CURRENCIES),
+                en_currency=rng.choice(_EN_CURRENCIES),
+            )
+        )
+    return messages
+
+
+def long_texts(count: int, length: int = 4000, seed: int = 7) -> List[str]:
+    """Длинные тексты вроде пересланных сводок: сообщения чата, склеенные до length символов."""
+    rng = random.Random(seed)
+    pool = chat_messages(2000, seed=seed)
+    texts: List[str] = []
+    for _ in range(count):
+        parts: List[str] = []
+        size = 0
+        while size < length:
+            part = rng.choice(pool)
+            parts.append(part)
+            size += len(part) + 1
+        texts.append("\n".join(parts)[:length])
+    return texts
+
+
+def amount_strings(count: int, seed: int = 3) -> List[str]:
+    rng = random.Random(seed)
+    return [_amount(rng) + rng.choice(["", "", "к", "млн", "k", "."]) for _ in range(count)]
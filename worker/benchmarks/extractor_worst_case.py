@@ -0,0 +1,141 @@
+"""Проверка худшего случая extract_currency_mentions на враждебных текстах.
+
+Для каждого семейства входов время меряется на нескольких длинах: наклон
+log(время)/log(длина) должен оставаться около 1 (линейное время), а время на
+длине 6000 символов (предел CurrencyDetectionRequest) - не выше --bound-ms.
+Дополнительно случайный фаззинг ищет самый медленный текст предельной длины.
+
+    python -m benchmarks.extractor_worst_case --output worst_case.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+from pathlib import Path
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Sequence
+
+from app.services.currency_extractor import extract_currency_mentions, get_dictionary
+
+MAX_TEXT_LENGTH = 6000
+
+
+def _repeat(unit: str) -> Callable[[int], str]:
+    return lambda length: (unit * (length // len(unit) + 1))[:length]
+
+
+FAMILIES: Dict[str, Callable[[int], str]] = {
+    "digits": _repeat("1"),
+    "digits_spaces": _repeat("1 "),
+    "digits_nbsp": _repeat("1  "),
+    "digits_fraction": _repeat("1,1."),
+    "symbol_mentions": _repeat("$1 "),
+    "mentions_after": _repeat("1 usd "),
+    "suffix_runs": _repeat("1 тыс"),
+    "alias_prefix": _repeat("1 долла"),
+    "alias_no_digits": _repeat("долларов "),
+    "latin_triples": _repeat("1 abcd "),
+    "spaces_then_digit": lambda length: " " * (length - 1) + "1",
+    "digit_then_spaces": lambda length: "1" + " " * (length - 1),
+    "unicode_digits": _repeat("١٢٣ ٤"),
+}
+
+_FUZZ_TOKENS = (
+    ["1", "23", "4 5", "0,5", "7.", " ", "  ", " ", "\n", "$", "€", "₽", "¥", "£", "-", "abc", "x"]
+    + list(get_dictionary().suffixes)
+    + list(get_dictionary().codes)
+    + [alias[: len(alias) // 2] for alias in get_dictionary().codes if len(alias) > 2]
+)
+
+
+def _best_time(text: str, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extract_currency_mentions(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _slope(lengths: Sequence[int], timings: Sequence[float]) -> float:
+    xs = [math.log(length) for length in lengths]
+    ys = [math.log(max(timing, 1e-9)) for timing in timings]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+
+
+def run_families(lengths: Sequence[int], repeat: int) -> Dict[str, Dict[str, object]]:
+    results: Dict[str, Dict[str, object]] = {}
+    for name, build in FAMILIES.items():
+        timings = [_best_time(build(length), repeat) for length in lengths]
+        at_limit = _best_time(build(MAX_TEXT_LENGTH), repeat)
+        results[name] = {
+            "ms": {str(length): round(timing * 1000, 4) for length, timing in zip(lengths, timings)},
+            "slope": round(_slope(lengths, timings), 3),
+            "ms_at_limit": round(at_limit * 1000, 4),
+        }
+    return results
+
+
+def run_fuzz(iterations: int, seed: int) -> Dict[str, object]:
+    rng = random.Random(seed)
+    worst_ms = 0.0
+    worst_text = ""
+    for _ in range(iterations):
+        parts: List[str] = []
+        size = 0
+        vocabulary = rng.sample(_FUZZ_TOKENS, k=rng.randint(2, 8))
+        while size < MAX_TEXT_LENGTH:
+            token = rng.choice(vocabulary)
+            parts.append(token)
+            size += len(token)
+        text = "".join(parts)[:MAX_TEXT_LENGTH]
+        elapsed = _best_time(text, 1) * 1000
+        if elapsed > worst_ms:
+            worst_ms, worst_text = elapsed, text
+    return {
+        "iterations": iterations,
+        "worst_ms": round(_best_time(worst_text, 3) * 1000, 4),
+        "worst_sample": worst_text[:80],
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--lengths", default="1500,3000,6000,12000,24000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fuzz", type=int, default=300, help="число случайных текстов предельной длины")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--bound-ms", type=float, default=50.0, help="допустимое время на 6000 символов")
+    parser.add_argument("--max-slope", type=float, default=1.3, help="допустимый наклон log-log")
+    args = parser.parse_args(argv)
+    lengths = [int(length) for length in args.lengths.split(",")]
+
+    families = run_families(lengths, args.repeat)
+    fuzz = run_fuzz(args.fuzz, args.seed)
+    failures = [
+        f"{name}: slope {stats['slope']}, {stats['ms_at_limit']} ms at {MAX_TEXT_LENGTH} chars"
+        for name, stats in families.items()
+        if stats["slope"] > args.max_slope or stats["ms_at_limit"] > args.bound_ms
+    ]
+    if fuzz["worst_ms"] > args.bound_ms:
+        failures.append(f"fuzz: {fuzz['worst_ms']} ms on {fuzz['worst_sample']!r}")
+
+    for name, stats in families.items():
+        print(f"{name:20} slope {stats['slope']:5}  {stats['ms_at_limit']:8} ms at {MAX_TEXT_LENGTH}")
+    print(f"{'fuzz':20} worst {fuzz['worst_ms']} ms over {fuzz['iterations']} texts")
+    if args.output:
+        report = {"bound_ms": args.bound_ms, "max_slope": args.max_slope, "families": families, "fuzz": fuzz}
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
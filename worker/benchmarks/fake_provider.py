@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from typing import Any, Dict, Tuple
+
+# Курсы в формате daily_json.js ЦБ РФ: код -> (номинал, рублей за номинал).
+CBR_RATES: Dict[str, Tuple[int, float]] = {
+    "AUD": (1, 58.7), "AZN": (1, 52.8), "GBP": (1, 113.9), "AMD": (100, 22.6),
+    "BYN": (1, 27.6), "BGN": (1, 49.9), "BRL": (1, 18.3), "HUF": (100, 25.1),
+    "VND": (10000, 36.4), "HKD": (10, 114.9), "GEL": (1, 33.4), "DKK": (1, 13.1),
+    "AED": (1, 24.4), "USD": (1, 89.7), "EUR": (1, 97.6), "EGP": (10, 29.0),
+    "INR": (10, 10.8), "IDR": (10000, 57.4), "KZT": (100, 19.6), "CAD": (1, 66.5),
+    "QAR": (1, 24.6), "KGS": (10, 10.0), "CNY": (1, 12.5), "MDL": (10, 50.4),
+    "NZD": (1, 54.9), "NOK": (10, 84.6), "PLN": (1, 22.5), "RON": (1, 19.6),
+    "XDR": (1, 119.5), "SGD": (1, 67.1), "TJS": (10, 82.1), "THB": (10, 25.6),
+    "TRY": (10, 29.6), "TMT": (1, 25.6), "UZS": (10000, 72.6), "UAH": (10, 23.6),
+    "CZK": (10, 39.6), "SEK": (10, 88.2), "CHF": (1, 104.0), "RSD": (100, 83.3),
+    "ZAR": (10, 47.6), "KRW": (1000, 68.5), "JPY": (100, 60.6),
+}
+
+
+def cbr_payload() -> Dict[str, Any]:
+    return {
+        "Date": "2024-01-17T11:30:00+03:00",
+        "Timestamp": "2024-01-16T20:00:00+03:00",
+        "Valute": {
+            code: {"CharCode": code, "Nominal": nominal, "Value": value, "Previous": value}
+            for code, (nominal, value) in CBR_RATES.items()
+        },
+    }
+
+
+class FakeRatesProvider:
+    """Локальная замена currency_rates_url: HTTP-сервер в отдельном потоке, отдающий Valute JSON."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        body = json.dumps(cbr_payload()).encode("utf-8")
+        provider = self
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                provider.requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/javascript; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-rates", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/daily_json.js"
+
+    def __enter__(self) -> "FakeRatesProvider":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,266 @@
+"""Микро- и макробенчмарки воркера с локальным поставщиком курсов.
+
+Запуск из каталога worker:
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --output new.json --baseline bench.json
+
+По умолчанию используется временная SQLite; для Postgres передайте --database-url.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+from .corpus import amount_strings, chat_messages, long_texts
+from .fake_provider import FakeRatesProvider, cbr_payload
+
+_PAIRS = [("USD", "RUB"), ("EUR", "RUB"), ("RUB", "USD"), ("CNY", "EUR"), ("KZT", "USD"), ("GBP", "JPY")]
+
+
+def _bench(func: Callable[[Any], Any], inputs: Sequence[Any], repeat: int) -> Dict[str, float]:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for value in inputs:
+            func(value)
+        timings.append((time.perf_counter() - started) / len(inputs))
+    best = min(timings)
+    return {
+        "calls": len(inputs) * repeat,
+        "per_call_us_best": round(best * 1e6, 3),
+        "per_call_us_median": round(statistics.median(timings) * 1e6, 3),
+        "calls_per_sec": round(1 / best, 1),
+    }
+
+
+def run_micro(repeat: int) -> Dict[str, Dict[str, float]]:
+    from app.services.currency import _parse_rates, convert_currency, get_rate_table
+    from app.services.currency_extractor import _normalize_amount, extract_currency_mentions
+
+    messages = chat_messages(5000)
+    plain = chat_messages(5000, money_share=0.0, seed=11)
+    texts = long_texts(50)
+    amounts = amount_strings(5000)
+    payload = cbr_payload()
+    table = get_rate_table()
+    rng = random.Random(5)
+    conversions = [(rng.uniform(1, 10000), *rng.choice(_PAIRS)) for _ in range(5000)]
+
+    return {
+        "extract_currency_mentions.chat": _bench(extract_currency_mentions, messages, repeat),
+        "extract_currency_mentions.chat_plain": _bench(extract_currency_mentions, plain, repeat),
+        "extract_currency_mentions.long_4k": _bench(extract_currency_mentions, texts, repeat),
+        "_normalize_amount": _bench(_normalize_amount, amounts, repeat),
+        "_parse_rates.cbr": _bench(_parse_rates, [payload] * 200, repeat),
+        "convert_currency.table": _bench(lambda item: convert_currency(*item, table), conversions, repeat),
+        "convert_currency.cached": _bench(lambda item: convert_currency(*item), conversions, repeat),
+    }
+
+
+def _percentile(values: Sequence[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+async def _load(
+    base_url: str, make_request: Callable[[int], Dict[str, Any]], total: int, concurrency: int, offset: int = 0
+) -> Dict[str, float]:
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(offset, offset + total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+
+        async def worker() -> None:
+            nonlocal errors
+            for number in counter:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(**make_request(number))
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 3) if latencies else None,
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else None,
+    }
+
+
+def _scenarios(count: int) -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    # Номер запроса сквозной по всем уровням, и текстов хватает на весь прогон:
+    # иначе следующие уровни мерили бы попадания в кэш распознавания.
+    messages = chat_messages(max(count, 2000), money_share=0.5, seed=21)
+    rng = random.Random(9)
+    conversions = [
+        {"amount": round(rng.uniform(1, 10000), 2), "base_currency": base, "quote_currency": quote}
+        for base, quote in (rng.choice(_PAIRS) for _ in range(2000))
+    ]
+    return {
+        "/convert": lambda n: {"method": "POST", "url": "/convert", "json": conversions[n % len(conversions)]},
+        "/detect-currencies": lambda n: {
+            "method": "POST",
+            "url": "/detect-currencies",
+            "json": {"text": messages[n % len(messages)]},
+        },
+        "/history": lambda n: {
+            "method": "GET",
+            "url": "/history",
+            "params": {"limit": 20, **({"base_currency": _PAIRS[n % len(_PAIRS)][0]} if n % 2 else {})},
+        },
+    }
+
+
+def run_macro(
+    base_url: str, levels: Sequence[int], total: int, reset: Callable[[], None] | None = None
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Нагрузка по уровням параллельности; reset вызывается перед каждым уровнем (сброс кэшей API)."""
+    warmup = min(total, 50)
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, make_request in _scenarios(warmup + total * len(levels)).items():
+        asyncio.run(_load(base_url, make_request, warmup, 4))
+        offset = warmup
+        results[name] = {}
+        for concurrency in levels:
+            if reset is not None:
+                reset()
+            results[name][str(concurrency)] = asyncio.run(_load(base_url, make_request, total, concurrency, offset))
+            offset += total
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server():
+    import uvicorn
+
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-api", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("benchmark server failed to start")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    lines: List[str] = []
+    for name, stats in current.get("micro", {}).items():
+        old = baseline.get("micro", {}).get(name)
+        if old:
+            ratio = stats["per_call_us_best"] / old["per_call_us_best"]
+            lines.append(f"micro {name}: {old['per_call_us_best']} -> {stats['per_call_us_best']} us (x{ratio:.2f})")
+    for endpoint, levels in current.get("macro", {}).items():
+        for concurrency, stats in levels.items():
+            old = baseline.get("macro", {}).get(endpoint, {}).get(concurrency)
+            if old and old.get("p99_ms") and stats.get("p99_ms"):
+                lines.append(
+                    f"macro {endpoint} c={concurrency}: {old['throughput_rps']} -> {stats['throughput_rps']} rps, "
+                    f"p99 {old['p99_ms']} -> {stats['p99_ms']} ms"
+                )
+    return lines
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path, default=Path("bench.json"))
+    parser.add_argument("--baseline", type=Path, help="предыдущий JSON для сравнения")
+    parser.add_argument("--database-url", help="по умолчанию временная SQLite")
+    parser.add_argument("--target-url", help="нагружать уже запущенный API вместо локального")
+    parser.add_argument("--concurrency", default="1,8,32", help="уровни параллельности через запятую")
+    parser.add_argument("--requests", type=int, default=500, help="запросов на каждый уровень")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов микробенчмарков")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-macro", action="store_true")
+    args = parser.parse_args(argv)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    with tempfile.TemporaryDirectory() as workdir, FakeRatesProvider() as provider:
+        os.environ["CURRENCY_RATES_URL"] = provider.url
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir}/bench.db"
+        from app.db import init_db
+
+        init_db()
+        results: Dict[str, Any] = {
+            "meta": {
+                "git_revision": _git_revision(),
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+                "concurrency": levels,
+                "requests_per_level": args.requests,
+            }
+        }
+        if not args.skip_micro:
+            results["micro"] = run_micro(args.repeat)
+        if not args.skip_macro:
+            if args.target_url:
+                results["macro"] = run_macro(args.target_url.rstrip("/"), levels, args.requests)
+            else:
+                from app.services.detection_cache import detection_cache
+
+                server, thread, base_url = _start_server()
+                try:
+                    results["macro"] = run_macro(base_url, levels, args.requests, detection_cache.clear)
+                finally:
+                    server.should_exit = True
+                    thread.join()
+        results["meta"]["provider_requests"] = provider.requests
+
+    args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"results written to {args.output}")
+    if args.baseline:
+        for line in _compare(results, json.loads(args.baseline.read_text(encoding="utf-8"))):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Стоимость упоминаний и сериализации ответов: прежний путь против нынешнего.
+
+Прежний путь воспроизведён здесь же: упоминания - обычный dataclass, ответы -
+модели Pydantic, которые FastAPI валидирует по response_model и кодирует
+JSONResponse. Нынешний - CurrencyMention-кортеж и словари, сразу отданные orjson.
+Для каждого случая меряются время (лучший из повторов) и аллокации tracemalloc.
+
+    python -m benchmarks.serialization --output serialization.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import json
+import os
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+# Приложение импортируется ради сериализаторов ответов, к БД бенчмарк не обращается.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import models
+from app.main import _detected_item, _json_response
+from app.schemas import (
+    CurrencyConversionDetail,
+    CurrencyDetectionBatchResponse,
+    CurrencyDetectionResponse,
+    DetectedCurrency,
+    HistoryResponse,
+)
+from app.services.currency import RateTable, _parse_rates, convert_many
+from app.services.currency_extractor import CurrencyMention, extract_currency_mentions
+
+from .corpus import chat_messages
+from .fake_provider import cbr_payload
+
+_TARGETS = ("RUB", "USD", "EUR", "CNY", "KZT")
+
+
+@dataclass
+class _DataclassMention:
+    amount: float
+    currency: str
+    match_text: str
+    start: int
+    end: int
+
+
+async def _measure(build: Callable[[], Awaitable[Any]], repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await build()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    result = await build()
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    # Блоки, которые удерживает результат (упоминания или тело ответа), и пик за время сборки.
+    retained = snapshot.statistics("filename")
+    return {
+        "ms": round(best * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "retained_kib": round(sum(stat.size for stat in retained) / 1024, 1),
+        "retained_blocks": sum(stat.count for stat in retained),
+    }
+
+
+def _mentions_case(texts: Sequence[str]) -> Tuple[Callable[[], Awaitable[Any]], Callable[[], Awaitable[Any]]]:
+    raw = [tuple(mention) for text in texts for mention in extract_currency_mentions(text)]
+
+    async def before() -> List[_DataclassMention]:
+        return [
+            _DataclassMention(amount=amount, currency=currency, match_text=match_text, start=start, end=end)
+            for amount, currency, match_text, start, end in raw
+        ]
+
+    async def after() -> List[CurrencyMention]:
+        return [CurrencyMention(*values) for values in raw]
+
+    return before, after
+
+
+def _detection_case(texts: Sequence[str], table: RateTable) -> Tuple[Callable[[], Awaitable[Any]], Callable[[], Awaitable[Any]]]:
+    detected = [extract_currency_mentions(text) for text in texts]
+    flat = [(mention, quote) for mentions in detected for mention in mentions for quote in _TARGETS if quote != mention.currency]
+    rates, converted = convert_many([m.amount for m, _ in flat], [m.currency for m, _ in flat], [q for _, q in flat], table)
+    # Как в эндпоинтах: пары без курса пропускаются, упоминания без конвертаций тоже.
+    conversions: Dict[int, List[Tuple[str, float, float]]] = {}
+    for (mention, quote), rate, value in zip(flat, rates.tolist(), converted.tolist()):
+        if rate == rate:
+            conversions.setdefault(id(mention), []).append((quote, rate, value))
+    detected = [[mention for mention in mentions if id(mention) in conversions] for mentions in detected]
+    field = create_response_field(name="response", type_=CurrencyDetectionBatchResponse)
+
+    async def before() -> bytes:
+        results = []
+        for mentions in detected:
+            items = []
+            for mention in mentions:
+                details = [
+                    CurrencyConversionDetail(quote_currency=quote, converted_amount=value, rate=rate)
+                    for quote, rate, value in conversions[id(mention)]
+                ]
+                items.append(
+                    DetectedCurrency(
+                        source_amount=mention.amount,
+                        source_currency=mention.currency,
+                        conversions=details,
+                        match_text=mention.match_text,
+                        start_index=mention.start,
+                        end_index=mention.end,
+                    )
+                )
+            results.append(CurrencyDetectionResponse(items=items))
+        content = await serialize_response(field=field, response_content=CurrencyDetectionBatchResponse(results=results))
+        return JSONResponse(content).body
+
+    async def after() -> bytes:
+        results = []
+        for mentions in detected:
+            items = []
+            for mention in mentions:
+                details = [
+                    {"quote_currency": quote, "converted_amount": value, "rate": rate}
+                    for quote, rate, value in conversions[id(mention)]
+                ]
+                items.append(_detected_item(mention, details))
+            results.append({"items": items})
+        return _json_response({"results": results}).body
+
+    return before, after
+
+
+def _history_case(limit: int) -> Tuple[Callable[[], Awaitable[Any]], Callable[[], Awaitable[Any]]]:
+    created_at = datetime(2024, 1, 17, tzinfo=timezone.utc)
+    values = [
+        (index, 100.0 + index, "USD", "RUB", 90.5, (100.0 + index) * 90.5, 1, None, created_at - timedelta(seconds=index))
+        for index in range(limit)
+    ]
+    columns = ("id", "amount", "base_currency", "quote_currency", "rate", "converted_amount", "rate_snapshot_id", "rate_date", "created_at")
+    conversions = [models.CurrencyConversion(**dict(zip(columns, row))) for row in values]
+    field = create_response_field(name="response", type_=HistoryResponse)
+
+    async def before() -> bytes:
+        content = await serialize_response(
+            field=field, response_content=HistoryResponse(conversions=conversions, next_cursor="cursor")
+        )
+        return JSONResponse(content).body
+
+    async def after() -> bytes:
+        return _json_response(
+            {"conversions": [dict(zip(columns, row)) for row in values], "next_cursor": "cursor"}
+        ).body
+
+    return before, after
+
+
+async def run(repeat: int) -> Dict[str, Dict[str, Any]]:
+    table = RateTable(_parse_rates(cbr_payload()), "RUB")
+    cases = {
+        "mentions": _mentions_case(chat_messages(60000, money_share=1.0)),
+        "detect_single": _detection_case(chat_messages(1, money_share=1.0, seed=4), table),
+        "detect_batch_1000": _detection_case(chat_messages(1000, money_share=0.8), table),
+        "history_100": _history_case(100),
+    }
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, (before, after) in cases.items():
+        if name != "mentions":
+            # Оба пути должны давать одинаковый JSON.
+            assert json.loads(await before()) == json.loads(await after()), name
+        results[name] = {"before": await _measure(before, repeat), "after": await _measure(after, repeat)}
+    return results
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.repeat))
+    for name, row in results.items():
+        before, after = row["before"], row["after"]
+        print(
+            f"{name:18} {before['ms']:9} -> {after['ms']:9} ms  "
+            f"peak {before['peak_kib']:9} -> {after['peak_kib']:9} KiB  "
+            f"retained {before['retained_kib']:9} -> {after['retained_kib']:9} KiB in "
+            f"{before['retained_blocks']:7} -> {after['retained_blocks']:7} blocks"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())